@@ -12,5 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'BigHouseProject.settings')
+# Serve the async versions of the tenant pages (see ASYNC_TENANT_VIEWS)
+os.environ.setdefault('BIGHOUSE_ASYNC_VIEWS', '1')
+# Threads don't outlive a request under ASGI, so connections can't persist
+# across requests; set DATABASE_POOL_MAX_SIZE to reuse them through a pool
+os.environ.setdefault('DATABASE_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
+import copy
 import os
 from pathlib import Path
 
@@ -45,8 +46,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'BigHouseWeb.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'BigHouseWeb.routers.ReplicaPinMiddleware',
     'django.middleware.common.CommonMiddleware',
     "django_browser_reload.middleware.BrowserReloadMiddleware",
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -59,7 +62,8 @@ ROOT_URLCONF = 'BigHouseProject.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing renders for the request metrics
+        'BACKEND': 'BigHouseWeb.metrics.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -67,6 +71,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'BigHouseWeb.context_processors.access_scope',
             ],
         },
     },
@@ -77,18 +82,104 @@ WSGI_APPLICATION = 'BigHouseProject.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+#
+# Read from the environment so each deployment brings its own credentials:
+#   DATABASE_NAME, DATABASE_USER, DATABASE_HOST, DATABASE_PORT
+#   DATABASE_PASSWORD   leave unset to use PGPASSWORD or ~/.pgpass
+#   DATABASE_CONN_MAX_AGE  seconds a connection is kept open and reused by
+#                       later requests in the same thread (default 60; 0
+#                       reconnects on every request). Connections are
+#                       health-checked before reuse, so a restarted
+#                       database server only costs one reconnect. Under
+#                       ASGI each request runs on its own thread, so asgi.py
+#                       defaults this to 0; use the pool below there.
+#
+# Set DATABASE_POOL_MAX_SIZE to use Django's built-in connection pool
+# instead, which needs psycopg 3: pip install "psycopg[binary,pool]".
+#   DATABASE_POOL_MIN_SIZE  connections each process keeps open (default 2)
+#   DATABASE_POOL_MAX_SIZE  most connections each process may open
+#   DATABASE_POOL_TIMEOUT   seconds a request waits for a free connection
+#                       before failing (default 10)
+# Every server process has its own pool, so keep processes times
+# DATABASE_POOL_MAX_SIZE below the server's max_connections, with room
+# for management commands.
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
 
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'bighousedb',  # Replace with your database name
-        'USER': 'postgres',
-        'PASSWORD': '55632214',
-        'HOST': 'localhost',
-        'PORT': '5432',  # Or the new port if changed
+        'NAME': os.environ.get('DATABASE_NAME', 'bighousedb'),
+        'USER': os.environ.get('DATABASE_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+        'HOST': os.environ.get('DATABASE_HOST', 'localhost'),
+        'PORT': os.environ.get('DATABASE_PORT', '5432'),
+        'CONN_MAX_AGE': env_int('DATABASE_CONN_MAX_AGE', 60),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
     }
 }
 
+if os.environ.get('DATABASE_POOL_MAX_SIZE'):
+    # CONN_HEALTH_CHECKS makes the pool check connections as it hands them out
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': env_int('DATABASE_POOL_MIN_SIZE', 2),
+        'max_size': env_int('DATABASE_POOL_MAX_SIZE', 0),
+        'timeout': env_int('DATABASE_POOL_TIMEOUT', 10),
+    }
+    # The pool owns connection lifetimes; Django must close (return) them per request
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+
+# Read replicas, as a comma-separated DATABASE_REPLICAS list of
+# host[:port][/name] entries; missing parts are taken from the primary,
+# e.g. "db-replica-1,db-replica-2" or, for two local databases,
+# "localhost/bighousedb_replica". The dashboards, exports and API read from
+# them (see BigHouseWeb.routers); all writes go to the primary. A browser
+# that writes is pinned to the primary for DATABASE_REPLICA_PIN_SECONDS so
+# it sees its own changes even while replicas lag behind.
+for number, replica in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1):
+    address, _, name = replica.strip().partition('/')
+    host, _, port = address.partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host or DATABASES['default']['HOST'],
+        'PORT': port or DATABASES['default']['PORT'],
+        'NAME': name or DATABASES['default']['NAME'],
+        'OPTIONS': copy.deepcopy(DATABASES['default']['OPTIONS']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_REPLICA_PIN_SECONDS = env_int('DATABASE_REPLICA_PIN_SECONDS', 10)
+DATABASE_ROUTERS = ['BigHouseWeb.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/ref/settings/#caches
+#
+# Sessions, the signed-in user with their profile, access scopes and the
+# dashboard table fragments are cached. Without CACHE_URL each process keeps
+# its own in-memory cache, which suits a single server process. With more
+# than one, set CACHE_URL to a shared Redis, e.g. redis://cache:6379/0
+# (pip install redis): otherwise a logout or profile change is only seen by
+# the process that served it until that process's copy expires.
+if os.environ.get('CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['CACHE_URL'],
+        }
+    }
+
+# Sessions are read from the cache and written through to the database, so
+# an authenticated request only touches the session table on a cache miss
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Loads the User with its UserProfile from the cache; see BigHouseWeb.backends
+AUTHENTICATION_BACKENDS = ['BigHouseWeb.backends.CachedModelBackend']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -130,6 +221,49 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media is served by BigHouseWeb.media.serve_media, which checks access and
+# sets ETag/Last-Modified. Behind nginx set MEDIA_SENDFILE_BACKEND = 'nginx'
+# and map MEDIA_ACCEL_REDIRECT_PREFIX to MEDIA_ROOT in an `internal` location;
+# use 'xsendfile' for Apache mod_xsendfile or lighttpd.
+MEDIA_SENDFILE_BACKEND = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 60 * 60
+# Paths under MEDIA_ROOT holding profile pictures, which only their user,
+# staff and the owners and managers of that user's building may fetch
+MEDIA_PRIVATE_PREFIXES = ['media/profile_pics/']
+
+# Contact form: each IP may send CONTACT_RATE_LIMIT messages per
+# CONTACT_RATE_PERIOD seconds. Accepted messages are fsynced to a spool
+# file and saved in bulk once CONTACT_SPOOL_MAX_MESSAGES have built up or
+# the oldest is CONTACT_SPOOL_MAX_AGE seconds old, by a background thread; run
+# `manage.py flush_contact_spool` from cron to flush quiet periods too.
+CONTACT_RATE_LIMIT = 5
+CONTACT_RATE_PERIOD = 60
+CONTACT_SPOOL_DIR = os.path.join(BASE_DIR, 'spool')
+CONTACT_SPOOL_MAX_MESSAGES = 100
+CONTACT_SPOOL_MAX_AGE = 30
+
+# Route the tenant profile and rent status pages to their async ORM views.
+# asgi.py switches this on; under WSGI the sync views are served.
+ASYNC_TENANT_VIEWS = os.environ.get('BIGHOUSE_ASYNC_VIEWS') == '1'
+
+# Live alert streams get their messages from this broker. The in-process
+# one suits a single ASGI process; with several worker processes use
+# 'BigHouseWeb.pubsub.PostgresBroker' (LISTEN/NOTIFY on the default database).
+PUBSUB_BROKER = 'BigHouseWeb.pubsub.InProcessBroker'
+
+# Every request's time, SQL queries, template rendering and response size
+# are aggregated per URL name and served in the Prometheus text format at
+# /metrics. The figures are per process: scrape each worker, or run one per
+# metrics port. Requests slower than METRICS_SLOW_REQUEST_MS are logged with
+# their slowest queries. /metrics answers requests carrying
+# `Authorization: Bearer <METRICS_TOKEN>` or coming from METRICS_ALLOWED_IPS
+# (comma separated), and 404s otherwise. Neither is set by default: behind a
+# proxy on the same host every visitor appears to come from 127.0.0.1.
+METRICS_SLOW_REQUEST_MS = env_int('METRICS_SLOW_REQUEST_MS', 500)
+METRICS_ALLOWED_IPS = list(filter(None, os.environ.get('METRICS_ALLOWED_IPS', '').split(',')))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
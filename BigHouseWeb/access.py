@@ -0,0 +1,86 @@
+# access.py
+from django.core.cache import cache
+from .models import Building
+
+# Seconds a computed scope stays in the cache. Entries are keyed on the
+# profile's scope_version, so a change of ownership or manager assignment
+# is picked up on the very next request regardless of this timeout.
+SCOPE_CACHE_TIMEOUT = 60 * 60
+
+
+class AccessScope:
+    """
+    What a user may reach: their role and the ids of the buildings they own
+    or manage. Worked out once per request (and cached across requests) so
+    views, forms and templates stop re-querying the profile and buildings.
+    """
+
+    def __init__(self, role, building_ids=()):
+        self.role = role
+        # Superusers reach every building, so no id set is kept for them
+        self.building_ids = None if role == 'superuser' else frozenset(building_ids)
+
+    @property
+    def is_superuser(self):
+        return self.role == 'superuser'
+
+    @property
+    def is_owner_or_superuser(self):
+        return self.role in ('superuser', 'owner')
+
+    @property
+    def is_manager_or_above(self):
+        return self.role in ('superuser', 'owner', 'manager')
+
+    def can_access_building(self, building_id):
+        return self.building_ids is None or building_id in self.building_ids
+
+    def buildings(self):
+        return self.filter(Building.objects.all(), 'pk')
+
+    def filter(self, queryset, building_field='building'):
+        # Limit a queryset to rows under the reachable buildings, without a join
+        if self.building_ids is None:
+            return queryset
+        return queryset.filter(**{f'{building_field}__in': self.building_ids})
+
+
+def compute_access_scope(user):
+    if not user.is_authenticated:
+        return AccessScope('anonymous')
+    if user.is_superuser:
+        return AccessScope('superuser')
+    # Users from before profiles existed may still lack one; they reach nothing
+    if not hasattr(user, 'userprofile'):
+        return AccessScope('tenant')
+
+    profile = user.userprofile
+    if profile.user_type == 'owner':
+        building_ids = Building.objects.filter(owner=user).values_list('pk', flat=True)
+    elif profile.user_type == 'manager':
+        building_ids = Building.objects.filter(managers=profile).values_list('pk', flat=True)
+    else:
+        building_ids = []
+    return AccessScope(profile.user_type, building_ids)
+
+
+def get_access_scope(user):
+    """
+    Return the user's AccessScope, memoised on the user object for the rest
+    of the request and cached under the profile's scope_version.
+    """
+    scope = getattr(user, '_access_scope', None)
+    if scope is not None:
+        return scope
+
+    if not user.is_authenticated or user.is_superuser or not hasattr(user, 'userprofile'):
+        scope = compute_access_scope(user)
+    else:
+        key = f'access_scope:{user.pk}:{user.userprofile.scope_version}'
+        scope = cache.get(key)
+        if scope is None:
+            scope = compute_access_scope(user)
+            cache.set(key, scope, SCOPE_CACHE_TIMEOUT)
+
+    user._access_scope = scope
+    return scope
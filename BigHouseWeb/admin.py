@@ -1,6 +1,14 @@
 # admin.py
-from django.contrib import admin
-from .models import UserProfile, Building, House, Tenant, RentPayment, ManagementAlert, ContactUs
+import io
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ORDER_VAR
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.text import Truncator
+from .forms import PortfolioImportForm
+from .importer import ImportFailed, PortfolioImporter, read_rows
+from .models import UserProfile, Building, House, Tenant, RentPayment, RentLedger, ManagementAlert, ContactUs
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -11,10 +19,59 @@ class UserProfileAdmin(admin.ModelAdmin):
 class BuildingAdmin(admin.ModelAdmin):
     list_display = ['name', 'address', 'owner', 'house_count', 'created_at']
     list_filter = ['owner', 'created_at']
+    change_list_template = 'admin/BigHouseWeb/building/change_list.html'
     
     def house_count(self, obj):
         return obj.houses.count()
     house_count.short_description = 'Number of Houses'
+    
+    def get_urls(self):
+        urls = [
+            path('import/', self.admin_site.admin_view(self.import_portfolio),
+                 name='BigHouseWeb_building_import'),
+        ]
+        return urls + super().get_urls()
+    
+    def import_portfolio(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:BigHouseWeb_building_changelist')
+        
+        importer = None
+        if request.method == 'POST':
+            form = PortfolioImportForm(request.POST, request.FILES)
+            if form.is_valid():
+                upload = form.cleaned_data['file']
+                file_format = 'jsonl' if upload.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+                # Decode as the rows are read rather than loading the upload into memory
+                stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+                importer = PortfolioImporter()
+                try:
+                    importer.run(read_rows(stream, file_format),
+                                 dry_run=form.cleaned_data['dry_run'],
+                                 skip_invalid=form.cleaned_data['skip_invalid'])
+                except ImportFailed:
+                    messages.error(request, f'{importer.error_count} invalid rows; nothing was imported.')
+                except UnicodeDecodeError:
+                    messages.error(request, 'The file must be UTF-8 encoded.')
+                else:
+                    counts = ', '.join(f'{count} {row_type}s' for row_type, count in importer.created.items())
+                    if form.cleaned_data['dry_run']:
+                        messages.info(request, f'Dry run, nothing saved: would import {counts}.')
+                    else:
+                        messages.success(request, f'Imported {counts}.')
+                        if not importer.error_count:
+                            return redirect('admin:BigHouseWeb_building_changelist')
+        else:
+            form = PortfolioImportForm()
+        
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Import portfolio',
+            'form': form,
+            'importer': importer,
+        }
+        return TemplateResponse(request, 'admin/BigHouseWeb/building/import_portfolio.html', context)
 
 @admin.register(House)
 class HouseAdmin(admin.ModelAdmin):
@@ -31,6 +88,13 @@ class RentPaymentAdmin(admin.ModelAdmin):
     list_display = ['tenant', 'amount', 'due_date', 'paid_date', 'status']
     list_filter = ['status', 'due_date']
 
+@admin.register(RentLedger)
+class RentLedgerAdmin(admin.ModelAdmin):
+    list_display = ['tenant', 'status', 'paid_through', 'outstanding', 'credit', 'updated_at']
+    list_filter = ['status']
+    list_select_related = ['tenant__user', 'tenant__house__building']
+    readonly_fields = ['tenant', 'paid_through', 'outstanding', 'credit', 'status', 'latest_due_date', 'updated_at']
+
 @admin.register(ManagementAlert)
 class ManagementAlertAdmin(admin.ModelAdmin):
     list_display = ['title', 'building', 'created_at', 'is_active']
@@ -38,7 +102,24 @@ class ManagementAlertAdmin(admin.ModelAdmin):
 
 @admin.register(ContactUs)
 class ContactUsAdmin(admin.ModelAdmin):
-    list_display = ['name', 'email', 'submitted_at']
+    list_display = ['name', 'email', 'excerpt', 'submitted_at']
     list_filter = ['submitted_at']
-    search_fields = ['name', 'email', 'message']
+    # Searched through the indexed search vector in get_search_results
+    search_fields = ['message']
+    search_help_text = 'Full-text search over name, email and message, e.g. "late rent" -parking'
     readonly_fields = ['submitted_at']
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        results = ContactUs.search(search_term, queryset)
+        # Best matches first, unless a column header was clicked
+        if ORDER_VAR in request.GET:
+            results = results.order_by(*queryset.query.order_by)
+        return results, False
+    
+    @admin.display(description='Message')
+    def excerpt(self, obj):
+        if hasattr(obj, 'headline'):
+            return obj.highlighted_headline()
+        return Truncator(obj.message).words(20)
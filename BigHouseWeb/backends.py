@@ -0,0 +1,34 @@
+# backends.py
+from asgiref.sync import sync_to_async
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+from .models import UserProfile
+
+# Entries are dropped whenever the user or profile is written; this bounds
+# how long an idle user's entry lingers, and how long a copy read just
+# before a write and cached just after it can stay stale
+USER_CACHE_TIMEOUT = 5 * 60
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that loads a request's User together with its UserProfile
+    in one query and caches the pair, so an authenticated request reaches
+    the view without reading either. Signals in models.py drop the entry
+    when the user or profile is saved or deleted.
+    """
+
+    def get_user(self, user_id):
+        key = UserProfile.cached_user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = User._default_manager.select_related('userprofile').filter(pk=user_id).first()
+            if user is None:
+                return None
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        return await sync_to_async(self.get_user)(user_id)
@@ -0,0 +1,278 @@
+# benchmarks.py
+import os
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+from statistics import median
+from time import perf_counter
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.urls import reverse
+
+from . import views
+from .models import (
+    Building, BuildingRollup, ContactUs, House, ManagementAlert, RentLedger, RentPayment, Tenant, UserProfile,
+    rebuild_pending_rollups,
+)
+
+# Latency budgets are for a developer machine; slower CI hosts can scale them
+LATENCY_SCALE = float(os.environ.get('BIGHOUSE_BENCHMARK_LATENCY_SCALE', '1'))
+REPEATS = int(os.environ.get('BIGHOUSE_BENCHMARK_REPEATS', '5'))
+BENCHMARK_PASSWORD = 'bench-password'
+
+Measurement = namedtuple('Measurement', 'status ms queries rows')
+
+
+class Benchmark:
+    """
+    One request to time: `url_name` resolved with `args(portfolio)`, sent
+    by the portfolio user named `role` (None for anonymous), and its
+    budgets for SQL queries, rows fetched and median wall time in ms.
+    Streams with `events` set are timed until that many events arrive.
+    """
+
+    def __init__(self, label, url_name, role, max_queries, max_rows, max_ms,
+                 method='get', args=None, data=None, status=200, events=None):
+        self.label = label
+        self.url_name = url_name
+        self.role = role
+        self.max_queries = max_queries
+        self.max_rows = max_rows
+        self.max_ms = max_ms
+        self.method = method
+        self.args = args
+        self.data = data or {}
+        self.status = status
+        self.events = events
+
+    def url(self, portfolio):
+        return reverse(self.url_name, args=self.args(portfolio) if self.args else None)
+
+    def over_budget(self, measurement):
+        """Descriptions of each budget the measurement went over."""
+        failures = []
+        if measurement.queries > self.max_queries:
+            failures.append(f'{measurement.queries} queries > {self.max_queries}')
+        if measurement.rows > self.max_rows:
+            failures.append(f'{measurement.rows} rows > {self.max_rows}')
+        if measurement.ms > self.max_ms * LATENCY_SCALE:
+            failures.append(f'{measurement.ms:.1f} ms > {self.max_ms * LATENCY_SCALE:.0f} ms')
+        return failures
+
+
+# Budgets are for the portfolio built by seed_benchmark_portfolio() with its
+# defaults; timed runs follow a warm-up, so cached table rows are hits
+BENCHMARKS = [
+    Benchmark('home', 'home', None, 0, 0, 50),
+    Benchmark('profile (tenant)', 'profile', 'tenant', 5, 15, 100),
+    Benchmark('profile (owner)', 'profile', 'owner', 2, 5, 100),
+    Benchmark('management dashboard', 'management_dashboard', 'owner', 8, 120, 250),
+    Benchmark('dashboard rows: houses', 'dashboard_rows', 'owner', 3, 60, 150, args=lambda p: ['houses']),
+    Benchmark('dashboard rows: tenants', 'dashboard_rows', 'manager', 3, 30, 150, args=lambda p: ['tenants']),
+    Benchmark('admin management', 'admin_management', 'owner', 4, 150, 400),
+    Benchmark('delete tenant', 'delete_tenant', 'manager', 70, 80, 500, method='post',
+              args=lambda p: [p.tenant.pk], status=302),
+    # The houses and alerts are deleted in the background after commit, which is untimed
+    Benchmark('delete building', 'delete_building', 'owner', 8, 10, 100, method='post',
+              args=lambda p: [p.building.pk], status=302),
+    Benchmark('mark rent paid', 'mark_rent_paid', 'manager', 16, 25, 200, method='post',
+              args=lambda p: [p.payment.pk], status=302),
+    Benchmark('rent status', 'rent_status', 'tenant', 5, 15, 100),
+    Benchmark('alert stream snapshot', 'alert_stream', 'tenant', 5, 10, 150, events=2),
+    Benchmark('process payment', 'process_payment', 'tenant', 16, 25, 200, method='post',
+              data={'amount': '1200.00', 'payment_method': 'card'}, status=302),
+    Benchmark('contact messages', 'contact_messages', 'superuser', 4, 20, 150),
+    Benchmark('contact search', 'contact_messages', 'superuser', 4, 20, 150, data={'q': 'leak'}),
+    Benchmark('contact form', 'contact_us', None, 0, 0, 50, method='post',
+              data={'name': 'Sender', 'email': 'sender@example.com', 'message': 'Hello'}),
+    Benchmark('api: payments', 'api_list', 'owner', 4, 250, 250, args=lambda p: ['payments']),
+    Benchmark('export: payments csv', 'export_data', 'owner', 3, 10, 500, args=lambda p: ['payments', 'csv']),
+    Benchmark('login page', 'login', None, 0, 0, 50),
+    # Password hashing dominates both of these
+    Benchmark('log in', 'login', None, 11, 5, 3000, method='post',
+              data={'username': 'bench-login', 'password': BENCHMARK_PASSWORD}, status=302),
+    Benchmark('register page', 'register', None, 0, 0, 50),
+    Benchmark('register', 'register', None, 15, 5, 1500, method='post', status=302, data={
+        'username': 'bench-new', 'email': 'new@example.com',
+        'password1': BENCHMARK_PASSWORD, 'password2': BENCHMARK_PASSWORD,
+    }),
+    Benchmark('logout', 'logout', 'tenant', 4, 5, 100, method='post', status=302),
+]
+
+
+class BenchmarkPortfolio:
+    """The users and rows the benchmarks request as and about."""
+
+    def __init__(self, users, **objects):
+        self.users = users
+        self.__dict__.update(objects)
+
+    def user(self, role):
+        return self.users[role] if role else None
+
+
+def seed_benchmark_portfolio(buildings=4, houses_per_building=25, months=6):
+    """
+    A realistic owner's portfolio: `buildings` buildings of occupied houses
+    with `months` of rent history per tenant, a few alerts per building,
+    contact messages, a manager and a superuser. Written with bulk inserts
+    and one ledger and rollup rebuild, so it takes seconds, not minutes.
+    """
+    owner = User.objects.create_user('bench-owner')
+    UserProfile.objects.filter(user=owner).update(user_type='owner')
+    superuser = User.objects.create_superuser('bench-admin', 'admin@example.com')
+    User.objects.create_user('bench-login', password=BENCHMARK_PASSWORD)
+
+    first_month = date.today().replace(day=1) - relativedelta(months=months - 1)
+    all_buildings = Building.objects.bulk_create([
+        Building(name=f'Building {b}', address=f'{b} Main St', owner=owner) for b in range(buildings)
+    ])
+    houses = House.objects.bulk_create([
+        House(building=building, house_number=str(n), rent_amount=Decimal('1200.00'), is_occupied=True)
+        for building in all_buildings for n in range(houses_per_building)
+    ])
+    unusable_password = make_password(None)
+    users = User.objects.bulk_create([
+        User(username=f'bench-tenant-{house.pk}', password=unusable_password) for house in houses
+    ])
+    UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+    tenants = Tenant.objects.bulk_create([Tenant(user=user, house=house) for user, house in zip(users, houses)])
+    RentPayment.objects.bulk_create([
+        RentPayment(
+            tenant=tenant, amount=house.rent_amount, due_date=period, period=period,
+            # The current month is still open
+            status='due' if m == months - 1 else 'paid',
+            paid_date=None if m == months - 1 else period,
+        )
+        for tenant, house in zip(tenants, houses)
+        for m, period in enumerate(first_month + relativedelta(months=+i) for i in range(months))
+    ])
+    ManagementAlert.objects.bulk_create([
+        ManagementAlert(building=building, title=f'Notice {n}', message='Water off on Tuesday morning')
+        for building in all_buildings for n in range(3)
+    ])
+    ContactUs.objects.bulk_create([
+        ContactUs(name=f'Sender {n}', email=f'sender{n}@example.com',
+                  message='There is a leak under the sink' if n % 5 == 0 else 'When is rent due?')
+        for n in range(50)
+    ])
+    RentLedger.rebuild_for_tenants([tenant.pk for tenant in tenants])
+    BuildingRollup.rebuild(BuildingRollup.current_month())
+
+    manager = User.objects.create_user('bench-manager')
+    UserProfile.objects.filter(user=manager).update(user_type='manager', managed_building=all_buildings[0])
+    tenant = tenants[0]
+    return BenchmarkPortfolio(
+        users={'owner': owner, 'manager': manager, 'superuser': superuser, 'tenant': tenant.user},
+        tenant=tenant, building=all_buildings[0], payment=tenant.rent_payments.filter(status='due').get(),
+    )
+
+
+class QueryRecorder:
+    """Database execute wrapper counting queries and the rows they return."""
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        self.queries += 1
+        cursor = context['cursor']
+        # Server-side cursors report no rowcount, so chunked exports count as zero
+        if cursor.description is not None and cursor.rowcount > 0:
+            self.rows += cursor.rowcount
+        return result
+
+
+async def open_event_stream(async_client, url, **extra):
+    """
+    Request an event stream and return the response with the view's own
+    generator. The test client wraps streaming_content again, and closing
+    a wrapper leaves the generator, and its subscription, open.
+    """
+    streams = []
+    alert_events = views.alert_events
+
+    def record_stream(*args):
+        streams.append(alert_events(*args))
+        return streams[-1]
+
+    with mock.patch.object(views, 'alert_events', record_stream):
+        response = await async_client.get(url, **extra)
+    return response, streams[0] if streams else None
+
+
+async def read_events(async_client, url, events, **extra):
+    response, stream = await open_event_stream(async_client, url, **extra)
+    chunks = aiter(response.streaming_content)
+    for _ in range(events):
+        await anext(chunks)
+    await chunks.aclose()
+    await stream.aclose()
+    return response
+
+
+def measure(client, async_client, benchmark, portfolio, remote_addr):
+    """
+    Send the benchmark's request once and time it. Its writes are rolled
+    back afterwards, so every run sees the same portfolio.
+    """
+    user = portfolio.user(benchmark.role)
+    active = async_client if benchmark.events else client
+    if user:
+        active.force_login(user)
+    else:
+        active.logout()
+    url = benchmark.url(portfolio)
+
+    with transaction.atomic():
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            started = perf_counter()
+            if benchmark.events:
+                response = async_to_sync(read_events)(async_client, url, benchmark.events, REMOTE_ADDR=remote_addr)
+            else:
+                response = getattr(client, benchmark.method)(url, benchmark.data, REMOTE_ADDR=remote_addr)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            # The run is rolled back rather than committed, so rebuild the
+            # rollups its commit would have
+            rebuild_pending_rollups()
+            elapsed = (perf_counter() - started) * 1000
+        transaction.set_rollback(True)
+    return Measurement(response.status_code, elapsed, recorder.queries, recorder.rows)
+
+
+def run_benchmark(client, async_client, benchmark, portfolio, repeats=REPEATS):
+    """
+    One untimed warm-up request, then `repeats` timed ones. Reports the
+    median time and the most queries and rows any run needed.
+    """
+    runs = [
+        measure(client, async_client, benchmark, portfolio, f'10.99.0.{n}')
+        for n in range(repeats + 1)
+    ][1:]
+    return Measurement(
+        status=runs[-1].status,
+        ms=median(run.ms for run in runs),
+        queries=max(run.queries for run in runs),
+        rows=max(run.rows for run in runs),
+    )
+
+
+def format_report(results):
+    """A table of (benchmark, measurement) pairs against their budgets."""
+    lines = [f'{"view":<26} {"status":>6} {"ms":>8} {"budget":>7} {"queries":>8} {"budget":>7} '
+             f'{"rows":>6} {"budget":>7}']
+    for benchmark, m in results:
+        lines.append(
+            f'{benchmark.label:<26} {m.status:>6} {m.ms:>8.1f} {benchmark.max_ms * LATENCY_SCALE:>7.0f} '
+            f'{m.queries:>8} {benchmark.max_queries:>7} {m.rows:>6} {benchmark.max_rows:>7}'
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,156 @@
+# contact_spool.py
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import ContactUs
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# One in-process lock per lock file, so a slow flush doesn't hold up appends
+_thread_locks = {'spool.lock': threading.Lock(), 'flush.lock': threading.Lock()}
+
+# Flushes run on one background worker, off the request that found the
+# spool due; held while a flush is queued, so a burst queues only one
+flush_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='contact-spool')
+_flush_queued = threading.Lock()
+
+# What this process has spooled since it last queued a flush, guarded by
+# the spool lock, so deciding whether a flush is due needn't read the file.
+# Another worker's flush takes these messages too, which at worst makes
+# the next flush here an early one.
+_spooled = {'count': 0, 'oldest': None}
+
+
+def allow_request(key, capacity, period):
+    """
+    Token bucket kept in the cache: `capacity` requests at once, refilled
+    at `capacity` tokens per `period` seconds. Concurrent requests may race
+    on the read-modify-write, which lets a burst overshoot by a request or
+    two but never blocks legitimate senders.
+    Returns (allowed, seconds until the next token).
+    """
+    now = time.time()
+    rate = capacity / period
+    tokens, updated = cache.get(key, (capacity, now))
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens < 1:
+        return False, (1 - tokens) / rate
+    cache.set(key, (tokens - 1, now), period)
+    return True, 0
+
+
+def spool_path():
+    return os.path.join(settings.CONTACT_SPOOL_DIR, 'contact.jsonl')
+
+
+@contextmanager
+def locked(name):
+    """Exclusive lock on a file in the spool directory, shared by every worker process."""
+    os.makedirs(settings.CONTACT_SPOOL_DIR, exist_ok=True)
+    with _thread_locks[name], open(os.path.join(settings.CONTACT_SPOOL_DIR, name), 'a') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def spool_message(cleaned_data):
+    """
+    Append an accepted message to the local spool and fsync it, so it
+    survives a restart before reaching the database. Queues a background
+    flush once this process has spooled CONTACT_SPOOL_MAX_MESSAGES, or its
+    oldest unflushed one is CONTACT_SPOOL_MAX_AGE seconds old.
+    """
+    record = {**cleaned_data, 'submitted_at': timezone.now(), 'spool_id': uuid.uuid4()}
+    line = json.dumps(record, cls=DjangoJSONEncoder) + '\n'
+    with locked('spool.lock'):
+        with open(spool_path(), 'a', encoding='utf-8') as spool:
+            spool.write(line)
+            spool.flush()
+            os.fsync(spool.fileno())
+        _spooled['count'] += 1
+        _spooled['oldest'] = _spooled['oldest'] or record['submitted_at']
+        due = spool_is_due()
+        if due:
+            # A flush queued or running now takes everything spooled so far
+            _spooled.update(count=0, oldest=None)
+    if due and _flush_queued.acquire(blocking=False):
+        flush_executor.submit(flush_queued_spool)
+
+
+def flush_queued_spool():
+    # Messages spooled from here on may queue the next flush
+    _flush_queued.release()
+    try:
+        flush_spool()
+    except Exception:
+        # They stay spooled for the next flush
+        logger.exception('Could not flush the contact spool')
+    finally:
+        # The worker thread outlives the job; don't leave its connection open
+        connections.close_all()
+
+
+def spool_is_due():
+    if not _spooled['count']:
+        return False
+    if _spooled['count'] >= settings.CONTACT_SPOOL_MAX_MESSAGES:
+        return True
+    return (timezone.now() - _spooled['oldest']).total_seconds() >= settings.CONTACT_SPOOL_MAX_AGE
+
+
+def flush_spool():
+    """
+    Move spooled messages into ContactUs with bulk_create. The spool is
+    renamed aside under the lock, so new messages keep appending to a
+    fresh file while the batch is written. A batch left behind by a crash
+    is picked up on the next flush; messages it already saved are skipped
+    by their spool_id. Returns the number of rows saved.
+    """
+    with locked('spool.lock'):
+        if os.path.exists(spool_path()):
+            os.replace(spool_path(), f'{spool_path()}.{os.getpid()}.{time.time_ns()}.flushing')
+
+    saved = 0
+    with locked('flush.lock'):
+        for batch_path in sorted(glob.glob(f'{spool_path()}.*.flushing')):
+            messages = []
+            with open(batch_path, encoding='utf-8') as batch:
+                for line in batch:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-write
+                        logger.warning('Skipping unreadable contact spool line in %s', batch_path)
+                        continue
+                    record['submitted_at'] = parse_datetime(record['submitted_at'])
+                    messages.append(ContactUs(**record))
+            spool_ids = [message.spool_id for message in messages if message.spool_id]
+            with transaction.atomic():
+                already_saved = ContactUs.objects.filter(spool_id__in=spool_ids).count()
+                ContactUs.objects.bulk_create(messages, batch_size=500, ignore_conflicts=True)
+            os.remove(batch_path)
+            saved += len(messages) - already_saved
+    return saved
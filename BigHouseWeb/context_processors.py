@@ -0,0 +1,8 @@
+# context_processors.py
+from django.utils.functional import SimpleLazyObject
+from .access import get_access_scope
+
+
+def access_scope(request):
+    # Lazy, so pages that never check roles don't pay for the lookup
+    return {'access_scope': SimpleLazyObject(lambda: get_access_scope(request.user))}
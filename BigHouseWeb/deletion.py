@@ -0,0 +1,102 @@
+# deletion.py
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import Building, House, ManagementAlert, Tenant, UserProfile
+
+logger = logging.getLogger(__name__)
+
+# Houses or alerts removed per transaction, which bounds how long each
+# one holds its locks
+DELETE_CHUNK_SIZE = 500
+
+# One worker: deletions are I/O-bound and rare, and running them one at a
+# time keeps them from competing with requests for locks
+deletion_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='building-deletion')
+
+
+def start_building_deletion(building):
+    """
+    Mark `building` as deleting, demote its managers and hand the rest to
+    a background job. Its houses, alerts and the building itself are
+    removed once this request's transaction has committed.
+    """
+    # Both updates commit together, and only then does the job start
+    with transaction.atomic():
+        managers = UserProfile.objects.filter(managed_building=building)
+        user_ids = list(managers.values_list('user_id', flat=True))
+        managers.update(
+            user_type=Case(When(user_type='manager', then=Value('tenant')), default=F('user_type')),
+            managed_building=None,
+            scope_version=F('scope_version') + 1,
+        )
+        Building.objects.filter(pk=building.pk).update(
+            deleting=True, houses_to_delete=building.houses.count(), houses_deleted=0,
+            version=F('version') + 1, changed_at=timezone.now(),
+        )
+        transaction.on_commit(lambda: deletion_executor.submit(delete_building_in_chunks, building.pk))
+    # The update skips the signals that drop cached users
+    UserProfile.forget_cached_users(user_ids)
+
+
+def delete_rows(model, ids):
+    # Plain DELETEs: the cascade collector would load every row first and
+    # the per-row signals would rebuild the building's rollups each time
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} WHERE id = ANY(%s)', [ids]
+        )
+        return cursor.rowcount
+
+
+def delete_building_in_chunks(building_id, chunk_size=DELETE_CHUNK_SIZE):
+    """
+    Remove a building marked as deleting: its houses and alerts
+    DELETE_CHUNK_SIZE at a time, each chunk in its own transaction, then the
+    building. Tenants are kept and lose their house, as with the cascade.
+    Chunks are locked with SKIP LOCKED, so it is safe to re-run after an
+    interruption, even alongside a run still going. Returns whether the
+    building was deleted.
+    """
+    if not Building.objects.filter(pk=building_id, deleting=True).exists():
+        return False
+    try:
+        while True:
+            with transaction.atomic():
+                house_ids = list(
+                    House.objects.filter(building_id=building_id).order_by('pk')
+                    .select_for_update(skip_locked=True).values_list('pk', flat=True)[:chunk_size]
+                )
+                if not house_ids:
+                    break
+                Tenant.objects.filter(house_id__in=house_ids).update(house=None)
+                deleted = delete_rows(House, house_ids)
+                # Bumping the version shows the progress on the admin page
+                Building.objects.filter(pk=building_id).update(
+                    houses_deleted=F('houses_deleted') + deleted, version=F('version') + 1,
+                )
+
+        while True:
+            with transaction.atomic():
+                alert_ids = list(
+                    ManagementAlert.objects.filter(building_id=building_id).order_by('pk')
+                    .select_for_update(skip_locked=True).values_list('pk', flat=True)[:chunk_size]
+                )
+                if not alert_ids:
+                    break
+                delete_rows(ManagementAlert, alert_ids)
+
+        with transaction.atomic():
+            building = Building.objects.select_for_update().filter(pk=building_id, deleting=True).first()
+            if building is None:
+                return False
+            # What is left (rollups, anything added meanwhile) is small
+            building.delete()
+        return True
+    except Exception:
+        logger.exception('Could not delete building %s', building_id)
+        return False
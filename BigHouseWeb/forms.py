@@ -3,6 +3,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import UserProfile, Building, House, ManagementAlert, ContactUs
+from .access import get_access_scope
 
 class CustomUserCreationForm(UserCreationForm):
     phone_number = forms.CharField(max_length=15, required=False)
@@ -49,16 +50,8 @@ class HouseForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         if user:
-            # Show only buildings owned by the current user
-            if user.userprofile.user_type == 'owner':
-                self.fields['building'].queryset = Building.objects.filter(owner=user)
-            elif user.userprofile.user_type == 'manager':
-                self.fields['building'].queryset = Building.objects.filter(managers=user.userprofile)
-            # Show all buildings for superusers
-            elif user.is_superuser:
-                self.fields['building'].queryset = Building.objects.all()
-            else:
-                self.fields['building'].queryset = Building.objects.none()
+            # Show only the buildings the user owns or manages (all for superusers)
+            self.fields['building'].queryset = get_access_scope(user).buildings()
 
 
 class AlertForm(forms.ModelForm):
@@ -71,14 +64,7 @@ class AlertForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         if user:
             # Show only buildings the user has access to
-            if user.userprofile.user_type == 'owner':
-                self.fields['building'].queryset = Building.objects.filter(owner=user)
-            elif user.userprofile.user_type == 'manager':
-                self.fields['building'].queryset = Building.objects.filter(managers=user.userprofile)
-            elif user.is_superuser:
-                self.fields['building'].queryset = Building.objects.all()
-            else:
-                self.fields['building'].queryset = Building.objects.none()
+            self.fields['building'].queryset = get_access_scope(user).buildings()
 
 
 class ContactUsForm(forms.ModelForm):
@@ -99,3 +85,9 @@ class ContactUsForm(forms.ModelForm):
                 'placeholder': 'Your Message'
             }),
         }
+
+
+class PortfolioImportForm(forms.Form):
+    file = forms.FileField(help_text='CSV with a header row, or JSONL with one object per line')
+    dry_run = forms.BooleanField(required=False, label='Validate only')
+    skip_invalid = forms.BooleanField(required=False, label='Import valid rows even if others fail')
@@ -0,0 +1,47 @@
+# fragments.py
+from django.core.cache import cache
+
+# Fragments are keyed on their building's change version, so a write is
+# picked up on the very next request regardless of this timeout; it only
+# bounds how long fragments of superseded versions linger
+FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+# Buildings whose fragments are read from the cache in one round trip, and
+# rendered together with one query when they are missing
+FRAGMENT_BATCH_SIZE = 20
+
+
+def fragment_key(name, variant, building_id, version):
+    return f'fragment:{name}:{variant}:{building_id}:{version}'
+
+
+def cached_fragments(keys, render):
+    """
+    Return {id: fragment} for the {id: cache key} pairs in `keys`. Misses
+    are rendered together by `render(ids)`, which must return a dict
+    covering every id it is given, and cached.
+    """
+    found = cache.get_many(keys.values())
+    missing = [fragment_id for fragment_id, key in keys.items() if key not in found]
+    if missing:
+        rendered = render(missing)
+        cache.set_many({keys[fragment_id]: rendered[fragment_id] for fragment_id in missing},
+                       FRAGMENT_CACHE_TIMEOUT)
+        found.update((keys[fragment_id], rendered[fragment_id]) for fragment_id in missing)
+    return {fragment_id: found[key] for fragment_id, key in keys.items()}
+
+
+def building_fragments(name, variant, versions, render):
+    """
+    Yield (building id, fragment) for each (building id, version) pair in
+    `versions`, in order. Fragments come from the cache, keyed on the
+    building's version; `render(building_ids)` renders the missing ones.
+    Fragments are fetched a batch at a time, so a caller that stops early
+    skips the rest. `variant` names whatever else the fragment depends on.
+    """
+    versions = list(versions)
+    for start in range(0, len(versions), FRAGMENT_BATCH_SIZE):
+        keys = {
+            building_id: fragment_key(name, variant, building_id, version)
+            for building_id, version in versions[start:start + FRAGMENT_BATCH_SIZE]
+        }
+        yield from cached_fragments(keys, render).items()
@@ -0,0 +1,102 @@
+# images.py
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Fixed square renditions of each profile picture, at twice the size they
+# are displayed (avatar 40px, small 96px) so they stay sharp on HiDPI screens
+RENDITIONS = {
+    'avatar': (80, 80),
+    'small': (192, 192),
+    'medium': (480, 480),
+}
+
+# Resizing is CPU-bound but Pillow releases the GIL, so a small thread pool
+# keeps it off the request thread without a separate worker service
+rendition_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='renditions')
+
+
+# Renditions live in a directory of their own, one folder per original
+# named after its file, so they can't collide with an upload or with the
+# renditions of a same-named picture of another type
+RENDITIONS_DIR = 'renditions'
+
+
+def rendition_name(name, rendition):
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, RENDITIONS_DIR, filename, f'{rendition}.jpg')
+
+
+def rendition_source(name):
+    """The original a rendition name was made from, or None if it isn't one."""
+    folder, filename = posixpath.split(name)
+    rendition, extension = posixpath.splitext(filename)
+    renditions_dir, original = posixpath.split(folder)
+    directory, marker = posixpath.split(renditions_dir)
+    if rendition not in RENDITIONS or extension != '.jpg' or marker != RENDITIONS_DIR or not original:
+        return None
+    return posixpath.join(directory, original)
+
+
+def generate_renditions(name):
+    """Write every rendition of the stored image `name`, replacing old ones."""
+    with default_storage.open(name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    for rendition, size in RENDITIONS.items():
+        thumbnail = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        thumbnail.save(buffer, 'JPEG', quality=85, optimize=True)
+        target = rendition_name(name, rendition)
+        if default_storage.exists(target):
+            default_storage.delete(target)
+        default_storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def delete_renditions(name):
+    for rendition in RENDITIONS:
+        target = rendition_name(name, rendition)
+        if default_storage.exists(target):
+            default_storage.delete(target)
+
+
+def build_profile_renditions(profile_id, name):
+    # Imported here to avoid a circular import with models
+    from .models import Building, UserProfile
+    try:
+        generate_renditions(name)
+    except Exception:
+        logger.exception('Could not generate renditions for %s', name)
+        return
+    # Only flag the profile if the picture wasn't replaced again meanwhile
+    if UserProfile.objects.filter(pk=profile_id, profile_picture=name).update(renditions_ready=True):
+        # Tenant rows and the cached user switch from the original picture to the avatar
+        user_ids = UserProfile.objects.filter(pk=profile_id).values_list('user_id', flat=True)
+        Building.bump_versions_for_users(user_ids)
+        UserProfile.forget_cached_users(user_ids)
+
+
+def build_renditions_in_worker(profile_id, name):
+    try:
+        build_profile_renditions(profile_id, name)
+    finally:
+        # Worker threads outlive the job; don't leave its connection open
+        connections.close_all()
+
+
+def schedule_profile_renditions(profile_id, name):
+    """Resize in the background once the upload's transaction has committed."""
+    transaction.on_commit(
+        lambda: rendition_executor.submit(build_renditions_in_worker, profile_id, name)
+    )
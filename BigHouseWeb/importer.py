@@ -0,0 +1,382 @@
+# importer.py
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+
+from .models import Building, BuildingRollup, House, RentLedger, RentPayment, Tenant, UserProfile
+
+# Columns understood in a portfolio file. Each row names its `type`; rows
+# may only refer to buildings, houses and tenants defined on earlier rows
+# or already in the database. Buildings are identified by owner and name.
+COLUMNS = ['type', 'building', 'address', 'owner', 'house_number', 'rent_amount',
+           'is_occupied', 'username', 'email', 'amount', 'due_date', 'status']
+ROW_TYPES = ('building', 'house', 'tenant', 'balance')
+# Building names are only unique per owner, so house and tenant rows name
+# the building's owner too; this marks a name the owner uses twice
+AMBIGUOUS = object()
+
+
+class RowError(Exception):
+    pass
+
+
+class ImportFailed(Exception):
+    """Raised to roll the import back; carries the importer's error report."""
+
+    def __init__(self, importer):
+        super().__init__(f'{importer.error_count} invalid rows')
+        self.importer = importer
+
+
+def read_rows(stream, file_format):
+    """Yield (line number, row dict) from a text stream without loading it whole."""
+    if file_format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_number, {'type': None, '_error': f'invalid JSON: {e}'}
+                    continue
+                if isinstance(row, dict):
+                    yield line_number, row
+                else:
+                    yield line_number, {'type': None, '_error': 'each line must be a JSON object'}
+    else:
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+
+
+class PortfolioImporter:
+    """
+    Streams rows into the database in chunks. Rows are validated a chunk at
+    a time against what already exists, then inserted with bulk_create, or
+    COPY on PostgreSQL for houses and opening balances, which need no ids
+    back. Only the current chunk and the error report are held in memory.
+    """
+
+    def __init__(self, batch_size=2000, use_copy=True, error_limit=1000):
+        self.batch_size = batch_size
+        self.use_copy = use_copy and connection.vendor == 'postgresql'
+        self.error_limit = error_limit
+        self.errors = []
+        self.error_count = 0
+        self.created = dict.fromkeys(ROW_TYPES, 0)
+        self.touched_buildings = set()
+
+    def run(self, rows, dry_run=False, skip_invalid=False):
+        """
+        Import every row in one transaction. It is rolled back on a dry run
+        or, unless skip_invalid is set, when any row fails validation.
+        """
+        try:
+            with transaction.atomic():
+                self.import_rows(rows)
+                if dry_run or (self.error_count and not skip_invalid):
+                    raise ImportFailed(self)
+        except ImportFailed:
+            if not dry_run:
+                raise
+        return self
+
+    def import_rows(self, rows):
+        buffers = {row_type: [] for row_type in ROW_TYPES}
+        pending = 0
+        for line_number, row in rows:
+            row_type = str(row.get('type') or '').strip().lower()
+            if row_type not in buffers:
+                self.add_error(line_number, row.get('_error') or f'unknown row type {row_type!r}')
+                continue
+            buffers[row_type].append((line_number, row))
+            pending += 1
+            if pending >= self.batch_size:
+                self.flush(buffers)
+                pending = 0
+        self.flush(buffers)
+
+        if self.touched_buildings:
+            BuildingRollup.rebuild(BuildingRollup.current_month(), self.touched_buildings)
+            Building.bump_versions(self.touched_buildings)
+
+    def flush(self, buffers):
+        # Parents first, so rows can refer to anything earlier in the file
+        for row_type in ROW_TYPES:
+            if buffers[row_type]:
+                getattr(self, f'import_{row_type}s')(buffers[row_type])
+                buffers[row_type].clear()
+
+    def add_error(self, line_number, message):
+        self.error_count += 1
+        if len(self.errors) < self.error_limit:
+            self.errors.append((line_number, message))
+
+    def validated(self, rows, parse):
+        for line_number, row in rows:
+            try:
+                yield line_number, parse(row)
+            except RowError as e:
+                self.add_error(line_number, str(e))
+
+    # Parsing helpers
+
+    @staticmethod
+    def text(row, column, required=True, max_length=None):
+        # JSON values may be numbers, e.g. a house number
+        value = str(row.get(column) or '').strip()
+        if required and not value:
+            raise RowError(f'{column} is required')
+        if max_length and len(value) > max_length:
+            raise RowError(f'{column} is longer than {max_length} characters')
+        return value
+
+    @staticmethod
+    def decimal(row, column, field):
+        """A non-negative amount that fits the model DecimalField `field`."""
+        try:
+            value = Decimal(str(row.get(column) or '').strip())
+        except InvalidOperation:
+            raise RowError(f'{column} must be a number')
+        if not value.is_finite():
+            raise RowError(f'{column} must be a number')
+        if value < 0:
+            raise RowError(f'{column} must not be negative')
+        # Checked before and after rounding: quantize fails on values past
+        # the context precision, and rounding may add a digit
+        whole_digits = field.max_digits - field.decimal_places
+        too_large = RowError(f'{column} must be less than {10 ** whole_digits}')
+        if value and value.adjusted() >= whole_digits:
+            raise too_large
+        try:
+            value = value.quantize(Decimal(1).scaleb(-field.decimal_places))
+        except InvalidOperation:
+            raise too_large
+        if value.adjusted() >= whole_digits:
+            raise too_large
+        return value
+
+    @staticmethod
+    def date(row, column):
+        try:
+            return datetime.strptime(str(row.get(column) or '').strip(), '%Y-%m-%d').date()
+        except ValueError:
+            raise RowError(f'{column} must look like YYYY-MM-DD')
+
+    @staticmethod
+    def flag(row, column):
+        return str(row.get(column) or '').strip().lower() in ('1', 'true', 'yes', 'y')
+
+    @staticmethod
+    def unique_ids(rows):
+        """
+        Map each key to its id from (key, id) pairs. Building names are only
+        unique per owner, and not even that is enforced, so a key matching
+        more than one row maps to AMBIGUOUS instead of an arbitrary one.
+        """
+        ids = {}
+        for key, pk in rows:
+            ids[key] = AMBIGUOUS if key in ids else pk
+        return ids
+
+    def building_ids(self, keys):
+        """Map (owner username, building name) to building id for one chunk."""
+        buildings = Building.objects.filter(
+            owner__username__in={owner for owner, _ in keys},
+            name__in={name for _, name in keys},
+        ).values_list('owner__username', 'name', 'pk')
+        return self.unique_ids(((owner, name), pk) for owner, name, pk in buildings)
+
+    def house_ids(self, keys):
+        """Map (owner username, building name, house number) to house id for one chunk."""
+        houses = House.objects.filter(
+            building__owner__username__in={owner for owner, _, _ in keys},
+            building__name__in={name for _, name, _ in keys},
+            house_number__in={number for _, _, number in keys},
+        ).values_list('building__owner__username', 'building__name', 'house_number', 'pk')
+        return self.unique_ids(((owner, name, number), pk) for owner, name, number, pk in houses)
+
+    # One importer per row type
+
+    def import_buildings(self, rows):
+        parsed = list(self.validated(rows, lambda row: {
+            'name': self.text(row, 'building', max_length=100),
+            'address': self.text(row, 'address'),
+            'owner': self.text(row, 'owner'),
+        }))
+        existing = self.building_ids({(values['owner'], values['name']) for _, values in parsed})
+        owners = dict(User.objects.filter(
+            username__in={values['owner'] for _, values in parsed}
+        ).values_list('username', 'pk'))
+
+        buildings = []
+        for line_number, values in parsed:
+            if (values['owner'], values['name']) in existing:
+                self.add_error(line_number, f"{values['owner']!r} already has a building {values['name']!r}")
+            elif values['owner'] not in owners:
+                self.add_error(line_number, f"unknown owner {values['owner']!r}")
+            else:
+                existing[(values['owner'], values['name'])] = None
+                buildings.append(Building(name=values['name'], address=values['address'],
+                                          owner_id=owners[values['owner']]))
+        Building.objects.bulk_create(buildings)
+        self.touched_buildings.update(building.pk for building in buildings)
+        self.created['building'] += len(buildings)
+
+    def import_houses(self, rows):
+        parsed = list(self.validated(rows, lambda row: {
+            'owner': self.text(row, 'owner'),
+            'building': self.text(row, 'building'),
+            'house_number': self.text(row, 'house_number', max_length=10),
+            'rent_amount': self.decimal(row, 'rent_amount', House._meta.get_field('rent_amount')),
+            'is_occupied': self.flag(row, 'is_occupied'),
+        }))
+        buildings = self.building_ids({(values['owner'], values['building']) for _, values in parsed})
+        existing = self.house_ids({
+            (values['owner'], values['building'], values['house_number']) for _, values in parsed
+        })
+
+        houses = []
+        for line_number, values in parsed:
+            building_id = buildings.get((values['owner'], values['building']))
+            key = (values['owner'], values['building'], values['house_number'])
+            if building_id is None:
+                self.add_error(line_number, f"unknown building {values['building']!r} of {values['owner']!r}")
+            elif building_id is AMBIGUOUS:
+                self.add_error(line_number, f"{values['owner']!r} has more than one building {values['building']!r}")
+            elif key in existing:
+                self.add_error(line_number, f'house {key[2]!r} already exists in {key[1]!r}')
+            else:
+                existing[key] = None
+                houses.append(House(building_id=building_id, house_number=key[2],
+                                    rent_amount=values['rent_amount'], is_occupied=values['is_occupied']))
+        self.insert(House, ['building_id', 'house_number', 'rent_amount', 'is_occupied'], houses)
+        self.touched_buildings.update(house.building_id for house in houses)
+        self.created['house'] += len(houses)
+
+    def import_tenants(self, rows):
+        parsed = list(self.validated(rows, lambda row: {
+            'owner': self.text(row, 'owner'),
+            'building': self.text(row, 'building'),
+            'house_number': self.text(row, 'house_number'),
+            'username': self.text(row, 'username', max_length=150),
+            'email': self.text(row, 'email', required=False),
+        }))
+        houses = self.house_ids({
+            (values['owner'], values['building'], values['house_number']) for _, values in parsed
+        })
+        taken_houses = set(Tenant.objects.filter(
+            house_id__in=[house_id for house_id in houses.values() if house_id is not AMBIGUOUS]
+        ).values_list('house_id', flat=True))
+        taken_names = set(User.objects.filter(
+            username__in={values['username'] for _, values in parsed}
+        ).values_list('username', flat=True))
+
+        accepted = []
+        for line_number, values in parsed:
+            house_id = houses.get((values['owner'], values['building'], values['house_number']))
+            if house_id is None:
+                self.add_error(line_number, f"unknown house {values['house_number']!r} in {values['building']!r} "
+                                            f"of {values['owner']!r}")
+            elif house_id is AMBIGUOUS:
+                self.add_error(line_number, f"{values['owner']!r} has more than one building {values['building']!r}")
+            elif house_id in taken_houses:
+                self.add_error(line_number, f"house {values['house_number']!r} already has a tenant")
+            elif values['username'] in taken_names:
+                self.add_error(line_number, f"username {values['username']!r} is taken")
+            else:
+                taken_houses.add(house_id)
+                taken_names.add(values['username'])
+                accepted.append((house_id, values))
+        if not accepted:
+            return
+
+        # Imported tenants sign in after a password reset, so skip hashing here
+        users = User.objects.bulk_create([
+            User(username=values['username'], email=values['email'], password='!')
+            for _, values in accepted
+        ])
+        # bulk_create skips the signal that normally creates profiles
+        UserProfile.objects.bulk_create([UserProfile(user=user, user_type='tenant') for user in users])
+        Tenant.objects.bulk_create([
+            Tenant(user=user, house_id=house_id) for user, (house_id, _) in zip(users, accepted)
+        ])
+        house_ids = [house_id for house_id, _ in accepted]
+        House.objects.filter(pk__in=house_ids).update(is_occupied=True)
+        self.touched_buildings.update(
+            House.objects.filter(pk__in=house_ids).values_list('building_id', flat=True).distinct()
+        )
+        self.created['tenant'] += len(accepted)
+
+    def import_balances(self, rows):
+        statuses = dict(RentPayment.STATUS_CHOICES)
+
+        def parse(row):
+            status = self.text(row, 'status', required=False) or 'due'
+            if status not in statuses:
+                raise RowError(f'status must be one of {", ".join(statuses)}')
+            return {
+                'username': self.text(row, 'username'),
+                'amount': self.decimal(row, 'amount', RentPayment._meta.get_field('amount')),
+                'due_date': self.date(row, 'due_date'),
+                'status': status,
+            }
+
+        parsed = list(self.validated(rows, parse))
+        tenants = {
+            username: (tenant_id, building_id)
+            for username, tenant_id, building_id in Tenant.objects.filter(
+                user__username__in={values['username'] for _, values in parsed}
+            ).values_list('user__username', 'pk', 'house__building_id')
+        }
+
+        payments = []
+        for line_number, values in parsed:
+            if values['username'] not in tenants:
+                self.add_error(line_number, f"unknown tenant {values['username']!r}")
+                continue
+            tenant_id, building_id = tenants[values['username']]
+            paid_date = values['due_date'] if values['status'] == 'paid' else None
+            payments.append(RentPayment(tenant_id=tenant_id, amount=values['amount'], due_date=values['due_date'],
+                                        paid_date=paid_date, status=values['status']))
+            self.touched_buildings.add(building_id)
+        self.insert(RentPayment, ['tenant_id', 'amount', 'due_date', 'paid_date', 'status'], payments)
+        RentLedger.rebuild_for_tenants({payment.tenant_id for payment in payments})
+        self.created['balance'] += len(payments)
+
+    def insert(self, model, fields, objects):
+        if not objects:
+            return
+        if not self.use_copy:
+            model.objects.bulk_create(objects)
+            return
+
+        copy_rows(model, fields, ([getattr(obj, f) for f in fields] for obj in objects))
+
+
+def copy_rows(model, fields, rows):
+    """
+    Insert `rows`, sequences of values in `fields` order, with PostgreSQL
+    COPY. It streams the chunk as CSV, far cheaper than a multi-row INSERT,
+    but gives no ids back.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['\\N' if value is None else value for value in row])
+    buffer.seek(0)
+
+    columns = ', '.join(connection.ops.quote_name(model._meta.get_field(f).column) for f in fields)
+    sql = (f'COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) '
+           f"FROM STDIN WITH (FORMAT csv, NULL '\\N')")
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):  # psycopg2
+            raw.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with raw.copy(sql) as copy:
+                copy.write(buffer.getvalue())
@@ -0,0 +1,99 @@
+# BigHouseWeb/management/commands/benchmark_db_connections.py
+import copy
+import importlib.util
+from statistics import mean, quantiles
+from time import perf_counter
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.db.utils import load_backend
+
+MODES = ('fresh', 'persistent', 'pool')
+
+
+def mode_settings(settings_dict, mode, pool_size):
+    settings_dict = copy.deepcopy(settings_dict)
+    settings_dict['OPTIONS'].pop('pool', None)
+    settings_dict['CONN_HEALTH_CHECKS'] = mode != 'fresh'
+    if mode == 'fresh':
+        settings_dict['CONN_MAX_AGE'] = 0
+    elif mode == 'persistent':
+        settings_dict['CONN_MAX_AGE'] = 60
+    else:
+        settings_dict['CONN_MAX_AGE'] = 0
+        settings_dict['OPTIONS']['pool'] = {'min_size': 1, 'max_size': pool_size, 'timeout': 10}
+    return settings_dict
+
+
+def simulate_requests(requests, queries):
+    """
+    Run `requests` request cycles on the default connection, each firing the
+    request signals Django uses to open and close connections around
+    `queries` small queries. Returns per-request latencies in milliseconds
+    and the number of database sessions that served them.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    latencies = []
+    backends = set()
+    for _ in range(requests):
+        started = perf_counter()
+        request_started.send(sender=__name__)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            backends.add(cursor.fetchone()[0])
+            for _ in range(queries - 1):
+                cursor.execute('SELECT 1')
+        request_finished.send(sender=__name__)
+        latencies.append((perf_counter() - started) * 1000)
+    return latencies, len(backends)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares request latency with a fresh database connection per request, '
+        'persistent connections (CONN_MAX_AGE) and the psycopg 3 connection pool'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--queries', type=int, default=5, help='Queries per request')
+        parser.add_argument('--pool-size', type=int, default=4)
+        parser.add_argument('--mode', choices=MODES, action='append',
+                            help='Mode to run (repeatable; defaults to all available)')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2 or options['queries'] < 1:
+            raise CommandError('Use at least 2 requests of at least 1 query')
+        modes = options['mode'] or [mode for mode in MODES if mode != 'pool' or self.pool_available()]
+        if 'pool' in modes and not self.pool_available():
+            raise CommandError('The pool needs psycopg 3: pip install "psycopg[binary,pool]"')
+
+        original = connections[DEFAULT_DB_ALIAS]
+        original.close()
+        backend = load_backend(original.settings_dict['ENGINE'])
+        self.stdout.write(f'{"mode":<11} {"mean ms":>8} {"p50 ms":>8} {"p99 ms":>8} {"sessions":>9}')
+        try:
+            for mode in modes:
+                wrapper = backend.DatabaseWrapper(
+                    mode_settings(original.settings_dict, mode, options['pool_size']), DEFAULT_DB_ALIAS
+                )
+                connections[DEFAULT_DB_ALIAS] = wrapper
+                try:
+                    # One untimed request, so the pool is filled before timing
+                    simulate_requests(1, 1)
+                    latencies, sessions = simulate_requests(options['requests'], options['queries'])
+                finally:
+                    wrapper.close()
+                    if mode == 'pool':
+                        wrapper.close_pool()
+                cuts = quantiles(latencies, n=100, method='inclusive')
+                self.stdout.write(
+                    f'{mode:<11} {mean(latencies):>8.2f} {cuts[49]:>8.2f} {cuts[98]:>8.2f} {sessions:>9}'
+                )
+        finally:
+            connections[DEFAULT_DB_ALIAS] = original
+
+    def pool_available(self):
+        # Django's pool option needs psycopg 3 and psycopg_pool; it imports the pool itself
+        return is_psycopg3 and importlib.util.find_spec('psycopg_pool') is not None
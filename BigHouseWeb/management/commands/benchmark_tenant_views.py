@@ -0,0 +1,89 @@
+# BigHouseWeb/management/commands/benchmark_tenant_views.py
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from statistics import quantiles
+from time import perf_counter
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+PAGES = {'profile': '/profile/', 'rent-status': '/rent-status/'}
+
+
+def tenant_session_cookie(username):
+    """Sign the tenant in server-side and return a Cookie header for the session."""
+    try:
+        user = User.objects.get(username=username)
+    except User.DoesNotExist:
+        raise CommandError(f'No user named {username!r}')
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+def timed_get(url, cookie):
+    started = perf_counter()
+    try:
+        with urlopen(Request(url, headers={'Cookie': cookie}), timeout=30) as response:
+            response.read()
+            # A redirect to the login page would also end in a 200
+            ok = response.status == 200 and response.geturl() == url
+    except (HTTPError, URLError):
+        ok = False
+    return perf_counter() - started, ok
+
+
+def run_load(url, cookie, requests, concurrency):
+    """
+    GET `url` `requests` times from `concurrency` threads.
+    Returns p50 and p99 latency in milliseconds, requests per second and
+    the number of failed requests.
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        started = perf_counter()
+        results = list(executor.map(lambda _: timed_get(url, cookie), range(requests)))
+        elapsed = perf_counter() - started
+    latencies = [latency * 1000 for latency, _ in results]
+    cuts = quantiles(latencies, n=100, method='inclusive')
+    return cuts[49], cuts[98], requests / elapsed, sum(1 for _, ok in results if not ok)
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-tests the tenant profile and rent status pages on running servers, '
+        'e.g. the WSGI app under gunicorn and the ASGI app under uvicorn, and '
+        'reports p50/p99 latency and requests per second for each'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi', metavar='URL', help='Base URL of the server running wsgi.py')
+        parser.add_argument('--asgi', metavar='URL', help='Base URL of the server running asgi.py')
+        parser.add_argument('--username', required=True, help='Tenant to request the pages as')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per page and server')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed requests sent first')
+        parser.add_argument('--page', choices=sorted(PAGES), action='append',
+                            help='Page to benchmark (repeatable; defaults to all)')
+
+    def handle(self, *args, **options):
+        servers = [(name, options[name].rstrip('/')) for name in ('wsgi', 'asgi') if options[name]]
+        if not servers:
+            raise CommandError('Pass --wsgi and/or --asgi with the base URL of a running server')
+        if options['requests'] < 2:
+            raise CommandError('--requests must be at least 2')
+
+        cookie = tenant_session_cookie(options['username'])
+        self.stdout.write(f'{"page":<12} {"server":<6} {"p50 ms":>8} {"p99 ms":>8} {"req/s":>8} {"errors":>7}')
+        for page in options['page'] or sorted(PAGES):
+            for name, base_url in servers:
+                url = base_url + PAGES[page]
+                for _ in range(options['warmup']):
+                    timed_get(url, cookie)
+                p50, p99, rps, errors = run_load(url, cookie, options['requests'], options['concurrency'])
+                self.stdout.write(f'{page:<12} {name:<6} {p50:>8.1f} {p99:>8.1f} {rps:>8.1f} {errors:>7}')
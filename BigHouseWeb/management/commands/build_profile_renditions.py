@@ -0,0 +1,19 @@
+# BigHouseWeb/management/commands/build_profile_renditions.py
+from django.core.management.base import BaseCommand
+from BigHouseWeb.images import build_profile_renditions
+from BigHouseWeb.models import UserProfile
+
+class Command(BaseCommand):
+    help = 'Builds missing profile picture renditions, e.g. for pictures uploaded before they existed'
+    
+    def handle(self, *args, **options):
+        profiles = (
+            UserProfile.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+            .filter(renditions_ready=False).values_list('pk', 'profile_picture')
+        )
+        count = 0
+        for profile_id, name in profiles.iterator():
+            build_profile_renditions(profile_id, name)
+            count += 1
+        
+        self.stdout.write(self.style.SUCCESS(f'Built renditions for {count} profile pictures'))
@@ -1,19 +1,48 @@
 # BigHouseWeb/management/commands/create_user_profiles.py
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User
 from BigHouseWeb.models import UserProfile
 
 class Command(BaseCommand):
     help = 'Creates UserProfile instances for all existing users without profiles'
-    
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Profiles inserted per statement')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the users without a profile')
+
     def handle(self, *args, **options):
-        users_without_profiles = User.objects.filter(userprofile__isnull=True)
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+        missing = User.objects.filter(userprofile__isnull=True)
+        total = missing.count()
+        if options['dry_run']:
+            self.stdout.write(f'{total} users have no profile')
+            return
+
+        # Walk the ids in pages rather than holding one cursor open, so each
+        # batch is a short query plus a short insert while the site is live
         count = 0
-        
-        for user in users_without_profiles:
-            UserProfile.objects.create(user=user)
-            count += 1
-        
+        last_id = 0
+        while True:
+            user_ids = list(
+                missing.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            # A profile created meanwhile by sign-up is left as it is, so
+            # the count is of users processed, not profiles inserted
+            UserProfile.objects.bulk_create([UserProfile(user_id=user_id) for user_id in user_ids],
+                                            ignore_conflicts=True)
+            # bulk_create skips the signal that drops cached users
+            UserProfile.forget_cached_users(user_ids)
+            count += len(user_ids)
+            last_id = user_ids[-1]
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{count}/{total} users processed')
+
         self.stdout.write(
-            self.style.SUCCESS(f'Successfully created {count} user profiles')
+            self.style.SUCCESS(f'Successfully processed {count} users without a profile')
         )
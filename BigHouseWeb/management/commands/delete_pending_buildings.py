@@ -0,0 +1,19 @@
+# BigHouseWeb/management/commands/delete_pending_buildings.py
+from django.core.management.base import BaseCommand
+from BigHouseWeb.deletion import DELETE_CHUNK_SIZE, delete_building_in_chunks
+from BigHouseWeb.models import Building
+
+class Command(BaseCommand):
+    help = 'Finishes deleting buildings whose background deletion was interrupted, e.g. by a restart'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DELETE_CHUNK_SIZE,
+                            help='Houses or alerts removed per transaction')
+    
+    def handle(self, *args, **options):
+        count = 0
+        for building_id in Building.objects.filter(deleting=True).values_list('pk', flat=True):
+            if delete_building_in_chunks(building_id, options['chunk_size']):
+                count += 1
+        
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} buildings'))
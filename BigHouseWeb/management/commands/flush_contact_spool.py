@@ -0,0 +1,10 @@
+# BigHouseWeb/management/commands/flush_contact_spool.py
+from django.core.management.base import BaseCommand
+from BigHouseWeb.contact_spool import flush_spool
+
+class Command(BaseCommand):
+    help = 'Saves contact form messages waiting in the local spool to the database'
+    
+    def handle(self, *args, **options):
+        saved = flush_spool()
+        self.stdout.write(self.style.SUCCESS(f'Saved {saved} contact messages'))
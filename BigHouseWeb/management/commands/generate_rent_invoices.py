@@ -0,0 +1,119 @@
+# BigHouseWeb/management/commands/generate_rent_invoices.py
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import F
+from BigHouseWeb.models import Building, Tenant, RentPayment, RentLedger
+
+
+def generate_invoices(period, due_date, batch_size, shard=0, shards=1):
+    """
+    Insert a 'due' RentPayment for every occupied house in the given shard
+    that has not been invoiced for `period` yet. Houses are split between
+    shards by building, so workers never touch the same tenants.
+    Returns the number of invoices created.
+    """
+    tenants = Tenant.objects.filter(house__is_occupied=True).order_by('pk')
+    if shards > 1:
+        tenants = tenants.alias(shard=F('house__building_id') % shards).filter(shard=shard)
+
+    created = 0
+    batch = []
+    for row in tenants.values_list('pk', 'house__rent_amount', 'house__building_id').iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) == batch_size:
+            created += insert_invoices(batch, period, due_date)
+            batch = []
+    if batch:
+        created += insert_invoices(batch, period, due_date)
+    return created
+
+
+def insert_invoices(batch, period, due_date):
+    tenant_ids = [tenant_id for tenant_id, _, _ in batch]
+    invoiced = set(
+        RentPayment.objects.filter(tenant_id__in=tenant_ids, period=period)
+        .values_list('tenant_id', flat=True)
+    )
+    rows = [(tenant_id, rent_amount) for tenant_id, rent_amount, _ in batch
+            if tenant_id not in invoiced]
+    if not rows:
+        return 0
+
+    with transaction.atomic():
+        inserted = insert_ignoring_conflicts(rows, period, due_date)
+        # The insert skips the save signals, so refresh the ledgers and versions here
+        RentLedger.rebuild_for_tenants(inserted)
+        Building.bump_versions({building_id for _, _, building_id in batch})
+    return len(inserted)
+
+
+def insert_ignoring_conflicts(rows, period, due_date):
+    """
+    Insert 'due' invoices for (tenant_id, amount) rows, skipping tenants a
+    concurrent run already invoiced for `period` (the unique tenant/period
+    constraint). bulk_create(ignore_conflicts=True) can't say which rows it
+    skipped, so this returns the tenant ids that were actually inserted.
+    """
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(RentPayment._meta.get_field(f).column)
+                        for f in ('tenant', 'amount', 'due_date', 'period', 'status'))
+    values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows))
+    params = [value for tenant_id, amount in rows
+              for value in (tenant_id, amount, due_date, period, 'due')]
+    sql = (f'INSERT INTO {qn(RentPayment._meta.db_table)} ({columns}) VALUES {values} '
+           f'ON CONFLICT DO NOTHING RETURNING {qn(RentPayment._meta.get_field("tenant").column)}')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [tenant_id for tenant_id, in cursor.fetchall()]
+
+
+def run_shard(args):
+    # Worker processes may be spawned rather than forked, so set Django up again
+    django.setup()
+    try:
+        return generate_invoices(*args)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Creates the monthly "due" rent invoices for every occupied house'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', help='Billing month as YYYY-MM (defaults to the current month)')
+        parser.add_argument('--due-day', type=int, default=1, help='Day of the month rent is due')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Split the work by building across this many processes')
+
+    def handle(self, *args, **options):
+        if options['period']:
+            try:
+                period = datetime.strptime(options['period'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--period must look like YYYY-MM')
+        else:
+            period = date.today().replace(day=1)
+
+        try:
+            due_date = period.replace(day=options['due_day'])
+        except ValueError:
+            raise CommandError(f'--due-day {options["due_day"]} is not a valid day in {period:%B %Y}')
+
+        batch_size = options['batch_size']
+        workers = options['workers']
+        if workers > 1:
+            # Children open their own connections; don't hand them ours
+            connections.close_all()
+            shards = [(period, due_date, batch_size, shard, workers) for shard in range(workers)]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                created = sum(executor.map(run_shard, shards))
+        else:
+            created = generate_invoices(period, due_date, batch_size)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Created {created} rent invoices for {period:%B %Y}')
+        )
@@ -0,0 +1,46 @@
+# BigHouseWeb/management/commands/import_portfolio.py
+import os
+from django.core.management.base import BaseCommand, CommandError
+from BigHouseWeb.importer import ImportFailed, PortfolioImporter, read_rows
+
+class Command(BaseCommand):
+    help = 'Imports buildings, houses, tenants and opening balances from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file with a header row, or JSONL with one object per line')
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Validate everything, then roll the import back')
+        parser.add_argument('--skip-invalid', action='store_true',
+                            help='Import the valid rows even when others fail validation')
+        parser.add_argument('--no-copy', action='store_true',
+                            help='Use bulk INSERTs even on PostgreSQL')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        if not os.path.isfile(path):
+            raise CommandError(f'{path} does not exist')
+
+        importer = PortfolioImporter(batch_size=options['batch_size'], use_copy=not options['no_copy'])
+        with open(path, newline='', encoding='utf-8') as stream:
+            try:
+                importer.run(read_rows(stream, file_format),
+                             dry_run=options['dry_run'], skip_invalid=options['skip_invalid'])
+            except ImportFailed:
+                pass
+
+        for line_number, message in importer.errors:
+            self.stderr.write(f'Line {line_number}: {message}')
+        if importer.error_count > len(importer.errors):
+            self.stderr.write(f'... and {importer.error_count - len(importer.errors)} more')
+
+        counts = ', '.join(f'{count} {row_type}s' for row_type, count in importer.created.items())
+        if options['dry_run']:
+            self.stdout.write(f'Dry run, nothing saved: would import {counts}')
+        elif importer.error_count and not options['skip_invalid']:
+            raise CommandError(f'{importer.error_count} invalid rows; nothing was imported')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Imported {counts}'))
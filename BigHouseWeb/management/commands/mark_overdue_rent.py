@@ -0,0 +1,64 @@
+# BigHouseWeb/management/commands/mark_overdue_rent.py
+from collections import Counter
+from datetime import date, datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from BigHouseWeb.models import Building, BuildingRollup, RentPayment, RentLedger
+
+class Command(BaseCommand):
+    help = "Moves 'due' rent payments whose due date has passed to 'overdue'. Meant to run daily from cron."
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', help='Treat this YYYY-MM-DD as today (defaults to today)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+    
+    def handle(self, *args, **options):
+        if options['as_of']:
+            try:
+                today = datetime.strptime(options['as_of'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--as-of must look like YYYY-MM-DD')
+        else:
+            today = date.today()
+        
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+        
+        # Served by the partial index on due_date for status='due'
+        past_due = RentPayment.objects.filter(status='due', due_date__lt=today)
+        per_building = Counter()
+        
+        while True:
+            # Short chunks keep each UPDATE's row locks brief while the site is live.
+            # The rows are locked as they are read, so a payment made meanwhile is
+            # either skipped by the read or waited for, and every row read is swept.
+            with transaction.atomic():
+                chunk = list(
+                    past_due.order_by('due_date', 'pk').select_for_update(of=('self',))
+                    .values_list('pk', 'tenant__house__building_id')[:batch_size]
+                )
+                if not chunk:
+                    break
+                RentPayment.objects.filter(pk__in=[pk for pk, _ in chunk]).update(status='overdue')
+            per_building.update(building_id for _, building_id in chunk)
+        
+        # Ledgers mirror their latest payment's status; every past-due one was just swept
+        RentLedger.objects.filter(status='due', latest_due_date__lt=today).update(
+            status='overdue', updated_at=timezone.now()
+        )
+        
+        # The UPDATEs skipped the save signals, so refresh arrears and versions here
+        if per_building:
+            building_ids = [pk for pk in per_building if pk]
+            BuildingRollup.rebuild(BuildingRollup.current_month(), building_ids)
+            Building.bump_versions(building_ids)
+        
+        names = dict(Building.objects.filter(pk__in=per_building).values_list('pk', 'name'))
+        for building_id, count in sorted(per_building.items(), key=lambda item: -item[1]):
+            name = names.get(building_id, 'No building')
+            self.stdout.write(f'{name}: {count} marked overdue')
+        self.stdout.write(
+            self.style.SUCCESS(f'Marked {sum(per_building.values())} rent payments overdue as of {today}')
+        )
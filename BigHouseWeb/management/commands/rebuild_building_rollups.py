@@ -0,0 +1,29 @@
+# BigHouseWeb/management/commands/rebuild_building_rollups.py
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from BigHouseWeb.models import Building, BuildingRollup
+
+class Command(BaseCommand):
+    help = 'Recomputes the per-building portfolio rollups for a month from scratch'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Month as YYYY-MM (defaults to the current month)')
+    
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                month = datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--month must look like YYYY-MM')
+        else:
+            month = BuildingRollup.current_month()
+        
+        with transaction.atomic():
+            rollups = BuildingRollup.rebuild(month)
+            # Cached admin rows show the rollups and are keyed on the building version
+            Building.bump_versions([rollup.building_id for rollup in rollups])
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {len(rollups)} building rollups for {month:%B %Y}')
+        )
@@ -0,0 +1,41 @@
+# BigHouseWeb/management/commands/rebuild_rent_ledger.py
+from django.core.management.base import BaseCommand
+from BigHouseWeb.models import Tenant, RentLedger
+
+class Command(BaseCommand):
+    help = 'Rebuilds every tenant rent ledger from payment history, or checks them for drift'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report ledgers that differ from their payment history')
+        parser.add_argument('--batch-size', type=int, default=1000)
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        check = options['check']
+        checked = drifted = 0
+        
+        tenant_ids = Tenant.objects.order_by('pk').values_list('pk', flat=True)
+        batch = []
+        for tenant_id in tenant_ids.iterator(chunk_size=batch_size):
+            batch.append(tenant_id)
+            if len(batch) == batch_size:
+                drifted += self.process_batch(batch, check)
+                checked += len(batch)
+                batch = []
+        if batch:
+            drifted += self.process_batch(batch, check)
+            checked += len(batch)
+        
+        if check:
+            style = self.style.WARNING if drifted else self.style.SUCCESS
+            self.stdout.write(style(f'Checked {checked} ledgers, {drifted} drifted from payment history'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {checked} ledgers ({drifted} changed)'))
+    
+    def process_batch(self, tenant_ids, check):
+        changed = RentLedger.rebuild_for_tenants(tenant_ids, save=not check)
+        if check:
+            for ledger in changed:
+                self.stdout.write(f'Drift: tenant {ledger.tenant_id} ({ledger.tenant})')
+        return len(changed)
@@ -0,0 +1,96 @@
+# BigHouseWeb/management/commands/seed_bighouse.py
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from time import perf_counter
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from BigHouseWeb.synthetic import PRESETS, SyntheticPortfolio
+
+
+def seed_chunk(args):
+    # Worker processes may be spawned rather than forked, so set Django up again
+    django.setup()
+    portfolio, indexes, owner_ids = args
+    try:
+        return portfolio.create_buildings(indexes, owner_ids)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills the database with a deterministic synthetic portfolio for load testing: '
+        'owners, managers, buildings, houses, tenants, rent history and alerts'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=sorted(PRESETS), default='small')
+        parser.add_argument('--buildings', type=int, help='Override the preset')
+        parser.add_argument('--houses-per-building', type=int, help='Override the preset')
+        parser.add_argument('--months', type=int, help='Months of rent history (overrides the preset)')
+        parser.add_argument('--until', help='Last month of rent history as YYYY-MM (defaults to the current month)')
+        parser.add_argument('--seed', type=int, default=1, help='Same seed, same data')
+        parser.add_argument('--prefix', default='synth', help='Prefix for usernames and building names')
+        parser.add_argument('--password', help='Password for every synthetic account, hashed once '
+                                               '(defaults to an unusable password)')
+        parser.add_argument('--batch-size', type=int, default=20, help='Buildings per transaction')
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Split the buildings across this many processes')
+
+    def handle(self, *args, **options):
+        size = dict(PRESETS[options['size']])
+        for name in size:
+            if options[name] is not None:
+                size[name] = options[name]
+        if min(size.values()) < 1 or options['batch_size'] < 1:
+            raise CommandError('Sizes and --batch-size must be at least 1')
+        if options['until']:
+            try:
+                until = datetime.strptime(options['until'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--until must look like YYYY-MM')
+        else:
+            until = date.today().replace(day=1)
+
+        self.verbosity = options['verbosity']
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f'Users prefixed {prefix!r} already exist; pick another --prefix')
+
+        portfolio = SyntheticPortfolio(
+            prefix, options['seed'], size['houses_per_building'], size['months'], until,
+            password_hash=make_password(options['password']) if options['password'] else '!',
+        )
+        started = perf_counter()
+        owner_ids = portfolio.create_owners(size['buildings'])
+        batch_size = options['batch_size']
+        chunks = [
+            (portfolio, range(start, min(start + batch_size, size['buildings'])), owner_ids)
+            for start in range(0, size['buildings'], batch_size)
+        ]
+
+        totals = Counter()
+        if options['workers'] > 1:
+            # Children open their own connections; don't hand them ours
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+                for counts in executor.map(seed_chunk, chunks):
+                    totals.update(counts)
+                    self.report_progress(totals, size['buildings'])
+        else:
+            for _, indexes, owner_ids in chunks:
+                totals.update(portfolio.create_buildings(indexes, owner_ids))
+                self.report_progress(totals, size['buildings'])
+
+        summary = ', '.join(f'{count} {name}' for name, count in totals.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(owner_ids)} owners, {summary} in {perf_counter() - started:.1f}s'
+        ))
+
+    def report_progress(self, totals, buildings):
+        if self.verbosity > 1:
+            self.stdout.write(f'{totals["buildings"]}/{buildings} buildings, {totals["payments"]} payments')
@@ -0,0 +1,176 @@
+# media.py
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseForbidden, StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .access import get_access_scope
+from .images import rendition_source
+from .models import Tenant, UserProfile
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def is_private(path):
+    return any(path.startswith(prefix) for prefix in settings.MEDIA_PRIVATE_PREFIXES)
+
+
+def private_file_profile(path):
+    """The profile whose picture, or one of its renditions, is stored at `path`."""
+    return UserProfile.objects.filter(profile_picture=rendition_source(path) or path).first()
+
+
+def can_view_private_file(user, path):
+    """
+    Private files may be seen by staff, the user they belong to, and the
+    owners and managers whose buildings that user lives in or manages.
+    """
+    if user.is_staff or user.is_superuser:
+        return True
+    profile = private_file_profile(path)
+    if profile is None:
+        return False
+    if profile.user_id == user.pk:
+        return True
+    scope = get_access_scope(user)
+    if not scope.is_manager_or_above:
+        return False
+    return (scope.can_access_building(profile.managed_building_id)
+            or scope.filter(Tenant.objects.filter(user_id=profile.user_id), 'house__building').exists())
+
+
+def parse_range(header, size):
+    """
+    Return the (start, end) byte positions of a well-formed single-range
+    header, or None when it can't be satisfied.
+    """
+    first, last = RANGE_RE.match(header.strip()).groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the final N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+def range_matches(request, etag, last_modified):
+    # If-Range holds either an ETag or a date; a stale one means send everything
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT with validators and byte ranges. Access
+    checks always happen here; with MEDIA_SENDFILE_BACKEND set, the bytes
+    themselves are handed to the front-end server to send.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    # Access is decided on the path, so only its canonical spelling is served;
+    # 'a/./b', 'a//b' and 'a/x/../b' would otherwise slip past the prefixes
+    if os.path.relpath(full_path, settings.MEDIA_ROOT).replace(os.sep, '/') != path:
+        raise Http404
+
+    if is_private(path):
+        if not request.user.is_authenticated:
+            return HttpResponseForbidden("You don't have permission to view this file.")
+        # Someone else's file is reported missing rather than forbidden
+        if not can_view_private_file(request.user, path):
+            raise Http404
+
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    size = stat.st_size
+    last_modified = int(stat.st_mtime)
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_media_response(request, path, full_path, size, etag, last_modified)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = (
+        f"{'private' if is_private(path) else 'public'}, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+    )
+    return response
+
+
+def build_media_response(request, path, full_path, size, etag, last_modified):
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    backend = settings.MEDIA_SENDFILE_BACKEND
+    if backend:
+        # The front-end server sends the bytes and handles Range itself
+        response = HttpResponse(content_type=content_type)
+        if backend == 'nginx':
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+        else:  # Apache mod_xsendfile, lighttpd
+            response['X-Sendfile'] = full_path
+        return response
+
+    # Only single ranges are honoured; multi-range requests are rare enough
+    # for images that they, like malformed headers, get the whole file
+    byte_range = None
+    match = RANGE_RE.match(request.headers.get('Range', '').strip())
+    if match and any(match.groups()) and range_matches(request, etag, last_modified):
+        byte_range = parse_range(match.group(0), size)
+        if byte_range is None:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            read_range(full_path, start, length), status=206, content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,200 @@
+# metrics.py
+import heapq
+import hmac
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+# How many of a slow request's queries are logged
+TOP_QUERIES = 5
+SQL_LOG_LENGTH = 500
+
+_request_metrics = ContextVar('request_metrics', default=None)
+
+
+class Histogram:
+    """
+    A Prometheus histogram with fixed buckets, one series per label tuple.
+    Observing is a bisect and a few additions under a lock.
+    """
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, label_values, value):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def count(self, label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            return sum(series[0]) if series else 0
+
+    def exposition(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for label_values, counts, total in series:
+            labels = ','.join(f'{name}="{escape_label(value)}"' for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+REQUEST_SECONDS = Histogram(
+    'bighouse_request_duration_seconds', 'Time to build the response, by URL name.',
+    ('view', 'method', 'status'), SECONDS)
+QUERY_COUNT = Histogram(
+    'bighouse_request_queries', 'SQL queries run per request.',
+    ('view',), (0, 1, 2, 5, 10, 20, 50, 100, 200, 500))
+QUERY_SECONDS = Histogram(
+    'bighouse_request_query_duration_seconds', 'Time spent in SQL per request.',
+    ('view',), SECONDS)
+TEMPLATE_SECONDS = Histogram(
+    'bighouse_request_template_duration_seconds', 'Time spent rendering templates per request.',
+    ('view',), SECONDS)
+RESPONSE_BYTES = Histogram(
+    'bighouse_response_size_bytes', 'Response body size; streamed responses are not counted.',
+    ('view',), (1_000, 5_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000))
+HISTOGRAMS = [REQUEST_SECONDS, QUERY_COUNT, QUERY_SECONDS, TEMPLATE_SECONDS, RESPONSE_BYTES]
+
+
+class RequestMetrics:
+    """Totals for one request; also the execute wrapper that counts its queries."""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.template_seconds = 0.0
+        # Min-heap of the (seconds, sql) of the slowest queries so far
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = perf_counter() - started
+            self.queries += 1
+            self.query_seconds += elapsed
+            if len(self.slowest) < TOP_QUERIES:
+                heapq.heappush(self.slowest, (elapsed, sql))
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (elapsed, sql))
+
+
+class RequestMetricsMiddleware:
+    """
+    Records each request's wall time, SQL queries and their time, template
+    rendering time and response size under its URL name, and logs
+    requests slower than METRICS_SLOW_REQUEST_MS with their slowest
+    queries. Streamed responses are timed until their headers are ready.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _request_metrics.set(metrics)
+        started = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _request_metrics.reset(token)
+        elapsed = perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        REQUEST_SECONDS.observe((view, request.method, str(response.status_code)), elapsed)
+        QUERY_COUNT.observe((view,), metrics.queries)
+        QUERY_SECONDS.observe((view,), metrics.query_seconds)
+        TEMPLATE_SECONDS.observe((view,), metrics.template_seconds)
+        if not response.streaming:
+            RESPONSE_BYTES.observe((view,), len(response.content))
+
+        if elapsed * 1000 >= settings.METRICS_SLOW_REQUEST_MS:
+            self.log_slow_request(request, view, elapsed, metrics)
+        return response
+
+    def log_slow_request(self, request, view, elapsed, metrics):
+        top = ''.join(
+            f'\n  {seconds * 1000:.1f} ms: {sql[:SQL_LOG_LENGTH]}'
+            for seconds, sql in sorted(metrics.slowest, reverse=True)
+        )
+        logger.warning(
+            'Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms, templates %.0f ms%s',
+            request.method, request.path, view, elapsed * 1000, metrics.queries,
+            metrics.query_seconds * 1000, metrics.template_seconds * 1000, top,
+        )
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        started = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics = _request_metrics.get()
+            if metrics is not None:
+                metrics.template_seconds += perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each render for RequestMetricsMiddleware."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def metrics_allowed(request):
+    token = settings.METRICS_TOKEN
+    authorization = request.headers.get('Authorization', '')
+    if token and hmac.compare_digest(authorization, f'Bearer {token}'):
+        return True
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    """This process's request histograms in the Prometheus text format."""
+    if not metrics_allowed(request):
+        raise Http404
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.exposition())
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
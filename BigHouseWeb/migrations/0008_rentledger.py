@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:06
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BigHouseWeb', '0007_alter_userprofile_profile_picture'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('paid_through', models.DateField(blank=True, null=True)),
+                ('outstanding', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12)),
+                ('credit', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=10)),
+                ('status', models.CharField(choices=[('paid', 'Paid'), ('due', 'Due'), ('overdue', 'Overdue'), ('no_payments', 'No Payments')], default='no_payments', max_length=12)),
+                ('latest_due_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('tenant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ledger', to='BigHouseWeb.tenant')),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BigHouseWeb', '0008_rentledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rentpayment',
+            name='period',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='rentpayment',
+            constraint=models.UniqueConstraint(condition=models.Q(('period__isnull', False)), fields=('tenant', 'period'), name='unique_invoice_per_tenant_period'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BigHouseWeb', '0009_rentpayment_period'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rentpayment',
+            index=models.Index(condition=models.Q(('status', 'due')), fields=['due_date'], name='rentpayment_due_date_open_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:09
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BigHouseWeb', '0010_rentpayment_due_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BuildingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('house_count', models.PositiveIntegerField(default=0)),
+                ('occupied_count', models.PositiveIntegerField(default=0)),
+                ('rent_roll', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('collected', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('arrears', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='BigHouseWeb.building')),
+            ],
+            options={
+                'unique_together': {('building', 'month')},
+            },
+        ),
+    ]
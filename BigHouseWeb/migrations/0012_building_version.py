@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BigHouseWeb', '0011_buildingrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BigHouseWeb', '0012_building_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='scope_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
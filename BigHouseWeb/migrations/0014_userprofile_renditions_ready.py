@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BigHouseWeb', '0013_userprofile_scope_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='renditions_ready',
+            field=models.BooleanField(default=False),
+        ),
+    ]
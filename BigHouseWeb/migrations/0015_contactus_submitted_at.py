@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:23
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BigHouseWeb', '0014_userprofile_renditions_ready'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contactus',
+            name='submitted_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 16:41
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BigHouseWeb', '0015_contactus_submitted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactus',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('name', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('email', config='english', weight='A'), django.contrib.postgres.search.SearchConfig('english')), '||', django.contrib.postgres.search.SearchVector('message', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='contactus',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='contactus_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BigHouseWeb', '0016_contactus_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='deleting',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='houses_deleted',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='building',
+            name='houses_to_delete',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def rebuild_renditions(apps, schema_editor):
+    # Renditions moved to their own directory; build_profile_renditions
+    # writes them there for every profile flagged here
+    UserProfile = apps.get_model('BigHouseWeb', 'UserProfile')
+    UserProfile.objects.filter(renditions_ready=True).update(renditions_ready=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BigHouseWeb', '0017_building_deleting'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_renditions, migrations.RunPython.noop),
+    ]
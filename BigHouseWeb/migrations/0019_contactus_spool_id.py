@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 19:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('BigHouseWeb', '0018_userprofile_renditions_dir'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactus',
+            name='spool_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -1,13 +1,24 @@
 # models.py
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector, SearchVectorField
+from django.db import transaction
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+import threading
+from collections import defaultdict
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from decimal import Decimal
+from .images import rendition_name, delete_renditions, schedule_profile_renditions
+from .pubsub import get_broker
+from .routers import primary_reads
 
 class UserProfile(models.Model):
     USER_TYPES = (
@@ -21,10 +32,49 @@ class UserProfile(models.Model):
     profile_picture = models.ImageField(upload_to='media/profile_pics/images', blank=True, null=True)
     phone_number = models.CharField(max_length=15, blank=True)
     managed_building = models.ForeignKey('Building', on_delete=models.SET_NULL, null=True, blank=True, related_name='managers')
+    # Bumped when the user's role or reachable buildings change; keys the cached access scope
+    scope_version = models.PositiveIntegerField(default=0)
+    # Set by the background resize once the picture's renditions exist
+    renditions_ready = models.BooleanField(default=False)
     
     def __str__(self):
         return f"{self.user.username} - {self.get_user_type_display()}"
     
+    def picture_url(self, rendition):
+        # Fall back to the original until the background resize has finished
+        if not self.profile_picture:
+            return ''
+        if self.renditions_ready:
+            return self.profile_picture.storage.url(rendition_name(self.profile_picture.name, rendition))
+        return self.profile_picture.url
+    
+    @property
+    def avatar_url(self):
+        return self.picture_url('avatar')
+    
+    @property
+    def small_url(self):
+        return self.picture_url('small')
+    
+    @property
+    def medium_url(self):
+        return self.picture_url('medium')
+    
+    @classmethod
+    def bump_scope_versions(cls, profiles):
+        profiles.update(scope_version=models.F('scope_version') + 1)
+        # A bulk update skips the signals that drop cached users
+        cls.forget_cached_users(profiles.values_list('user_id', flat=True))
+    
+    @staticmethod
+    def cached_user_key(user_id):
+        return f'auth_user:{user_id}'
+    
+    @classmethod
+    def forget_cached_users(cls, user_ids):
+        # Drop the User-with-profile entries CachedModelBackend serves requests from
+        cache.delete_many([cls.cached_user_key(user_id) for user_id in user_ids])
+    
     def clean(self):
         # A manager must have a building assigned
         if self.user_type == 'manager' and not self.managed_building:
@@ -40,10 +90,32 @@ class Building(models.Model):
     address = models.TextField()
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_buildings')
     created_at = models.DateTimeField(default=timezone.now)
+    # Bumped whenever the building or anything under it changes
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+    # Set while BigHouseWeb.deletion removes the building in the background,
+    # with how many of its houses were there and how many are gone so far
+    deleting = models.BooleanField(default=False)
+    houses_to_delete = models.PositiveIntegerField(default=0)
+    houses_deleted = models.PositiveIntegerField(default=0)
     
     def __str__(self):
         return self.name
     
+    @classmethod
+    def bump_versions(cls, building_ids):
+        cls.objects.filter(pk__in=building_ids).update(
+            version=models.F('version') + 1, changed_at=timezone.now()
+        )
+    
+    @classmethod
+    def bump_versions_for_users(cls, user_ids):
+        # The buildings whose table rows show these users: those they own
+        # and those they are tenants in
+        cls.bump_versions(cls.objects.filter(
+            models.Q(owner_id__in=user_ids) | models.Q(houses__tenant__user_id__in=user_ids)
+        ).values('pk'))
+    
     def house_count(self):
         return self.houses.count()
 
@@ -82,11 +154,34 @@ class RentPayment(models.Model):
     due_date = models.DateField()
     paid_date = models.DateField(null=True, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='due')
+    # First day of the billing month for generated invoices; empty for ad-hoc payments
+    period = models.DateField(null=True, blank=True)
+    
+    class Meta:
+        constraints = [
+            # One invoice per tenant and billing period, so generation can be re-run safely
+            models.UniqueConstraint(
+                fields=['tenant', 'period'],
+                condition=models.Q(period__isnull=False),
+                name='unique_invoice_per_tenant_period',
+            ),
+        ]
+        indexes = [
+            # Only rows still waiting on payment, which is all the overdue sweep scans
+            models.Index(
+                fields=['due_date'],
+                condition=models.Q(status='due'),
+                name='rentpayment_due_date_open_idx',
+            ),
+        ]
 
-    def calculate_next_due_date(self):
-        if self.paid_date and self.amount and self.tenant.house.rent_amount:
+    def calculate_next_due_date(self, rent_amount=None):
+        # Callers that already know the rent can pass it to skip loading tenant.house
+        if rent_amount is None and self.paid_date and self.amount:
+            rent_amount = self.tenant.house.rent_amount
+        if self.paid_date and self.amount and rent_amount:
             # Calculate how many months were paid for
-            months_paid = (self.amount / self.tenant.house.rent_amount).normalize()
+            months_paid = (self.amount / rent_amount).normalize()
             
             if months_paid % 1 == 0:  # Whole number of months
                 months = int(months_paid)
@@ -95,7 +190,7 @@ class RentPayment(models.Model):
             else:
                 # Partial payment - calculate full months and remainder
                 full_months = int(months_paid)
-                remainder = self.amount % self.tenant.house.rent_amount
+                remainder = self.amount % rent_amount
                 next_due = self.paid_date + relativedelta(months=+full_months)
                 return next_due, remainder
         return None, None
@@ -105,6 +200,232 @@ class RentPayment(models.Model):
     def __str__(self):
         return f"{self.tenant} - {self.due_date} - {self.status}"
 
+class RentLedger(models.Model):
+    """
+    A tenant's current standing, kept up to date whenever one of their
+    RentPayment rows is written so status pages read a single row instead
+    of replaying the payment history.
+    """
+    STATUS_CHOICES = RentPayment.STATUS_CHOICES + (
+        ('no_payments', 'No Payments'),
+    )
+    
+    tenant = models.OneToOneField(Tenant, on_delete=models.CASCADE, related_name='ledger')
+    paid_through = models.DateField(null=True, blank=True)
+    outstanding = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0'))
+    credit = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0'))
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='no_payments')
+    latest_due_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Fields compared when checking a stored ledger against its history
+    BALANCE_FIELDS = ('paid_through', 'outstanding', 'credit', 'status', 'latest_due_date')
+    
+    def __str__(self):
+        return f"{self.tenant} - {self.status}"
+    
+    @property
+    def next_due_date(self):
+        return self.paid_through or self.latest_due_date
+    
+    @staticmethod
+    def compute(payments, rent_amount):
+        """Work out the balance fields from a tenant's full payment history."""
+        balance = {
+            'paid_through': None,
+            'outstanding': Decimal('0'),
+            'credit': Decimal('0'),
+            'status': 'no_payments',
+            'latest_due_date': None,
+        }
+        latest = latest_paid = None
+        for payment in payments:
+            if payment.status != 'paid':
+                balance['outstanding'] += payment.amount
+            if latest is None or (payment.due_date, payment.pk) > (latest.due_date, latest.pk):
+                latest = payment
+            if payment.status == 'paid' and payment.paid_date and (
+                latest_paid is None or
+                (payment.paid_date, payment.due_date) > (latest_paid.paid_date, latest_paid.due_date)
+            ):
+                latest_paid = payment
+        
+        if latest:
+            balance['status'] = latest.status
+            balance['latest_due_date'] = latest.due_date
+        if latest_paid and rent_amount:
+            paid_through, remainder = latest_paid.calculate_next_due_date(rent_amount)
+            balance['paid_through'] = paid_through
+            balance['credit'] = remainder or Decimal('0')
+        return balance
+    
+    @classmethod
+    def refresh_for_tenant(cls, tenant_id, create=True):
+        """
+        Recompute and store one tenant's ledger. Call inside the transaction
+        that wrote the payment so the two can never disagree.
+        """
+        tenant = Tenant.objects.select_related('house').filter(pk=tenant_id).first()
+        if tenant is None:
+            return None
+        rent_amount = tenant.house.rent_amount if tenant.house else None
+        balance = cls.compute(RentPayment.objects.filter(tenant_id=tenant_id), rent_amount)
+        
+        if cls.objects.filter(tenant_id=tenant_id).update(updated_at=timezone.now(), **balance):
+            return cls(tenant=tenant, **balance)
+        if create:
+            return cls.objects.create(tenant=tenant, **balance)
+        return None
+    
+    @classmethod
+    def rebuild_for_tenants(cls, tenant_ids, save=True):
+        """
+        Recompute the ledgers of many tenants with one query each for
+        tenants, payments and stored ledgers. Used after bulk payment
+        writes, which skip the save signals. Returns the ledgers that
+        were missing or out of date.
+        """
+        tenants = Tenant.objects.select_related('house').in_bulk(tenant_ids)
+        payments = defaultdict(list)
+        for payment in RentPayment.objects.filter(tenant_id__in=tenant_ids):
+            payments[payment.tenant_id].append(payment)
+        stored = cls.objects.in_bulk(tenant_ids, field_name='tenant_id')
+        
+        changed = []
+        now = timezone.now()
+        for tenant_id, tenant in tenants.items():
+            rent_amount = tenant.house.rent_amount if tenant.house else None
+            balance = cls.compute(payments[tenant_id], rent_amount)
+            ledger = stored.get(tenant_id)
+            if ledger is None:
+                ledger = cls(tenant=tenant)
+            elif all(getattr(ledger, field) == balance[field] for field in cls.BALANCE_FIELDS):
+                continue
+            for field, value in balance.items():
+                setattr(ledger, field, value)
+            ledger.updated_at = now
+            changed.append(ledger)
+        
+        if save and changed:
+            # Split first: bulk_create sets the new ledgers' pks
+            new = [ledger for ledger in changed if ledger.pk is None]
+            existing = [ledger for ledger in changed if ledger.pk is not None]
+            with transaction.atomic():
+                cls.objects.bulk_create(new)
+                cls.objects.bulk_update(existing, list(cls.BALANCE_FIELDS) + ['updated_at'])
+        return changed
+    
+    @classmethod
+    def for_tenant(cls, tenant):
+        try:
+            return tenant.ledger
+        except cls.DoesNotExist:
+            with transaction.atomic():
+                return cls.refresh_for_tenant(tenant.pk)
+
+
+class BuildingRollup(models.Model):
+    """
+    Portfolio figures for one building and month, refreshed by signals on
+    house, tenant and payment writes so dashboards read them directly.
+    Arrears are the unpaid amounts already swept to 'overdue'.
+    """
+    building = models.ForeignKey(Building, on_delete=models.CASCADE, related_name='rollups')
+    month = models.DateField()
+    house_count = models.PositiveIntegerField(default=0)
+    occupied_count = models.PositiveIntegerField(default=0)
+    rent_roll = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    collected = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    arrears = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0'))
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    FIGURE_FIELDS = ('house_count', 'occupied_count', 'rent_roll', 'collected', 'arrears')
+    
+    class Meta:
+        unique_together = ('building', 'month')
+    
+    def __str__(self):
+        return f"{self.building} - {self.month:%B %Y}"
+    
+    @property
+    def occupancy_rate(self):
+        if not self.house_count:
+            return 0
+        return round(100 * self.occupied_count / self.house_count)
+    
+    @staticmethod
+    def current_month():
+        return timezone.localdate().replace(day=1)
+    
+    @classmethod
+    def rebuild(cls, month, building_ids=None):
+        """
+        Recompute the rollups of `building_ids` (every building if None) for
+        `month` with one grouped query over houses and one over payments.
+        """
+        next_month = month + relativedelta(months=+1)
+        houses = House.objects.all()
+        payments = RentPayment.objects.all()
+        if building_ids is not None:
+            houses = houses.filter(building_id__in=building_ids)
+            payments = payments.filter(tenant__house__building_id__in=building_ids)
+        else:
+            building_ids = Building.objects.values_list('pk', flat=True)
+        
+        figures = {building_id: dict.fromkeys(cls.FIGURE_FIELDS, 0) for building_id in building_ids}
+        occupied = models.Q(is_occupied=True)
+        for row in houses.values('building_id').annotate(
+            house_count=models.Count('pk'),
+            occupied_count=models.Count('pk', filter=occupied),
+            rent_roll=models.Sum('rent_amount', filter=occupied),
+        ):
+            building_id = row.pop('building_id')
+            figures.setdefault(building_id, dict.fromkeys(cls.FIGURE_FIELDS, 0)).update(row)
+        for row in payments.values(building_id=models.F('tenant__house__building_id')).annotate(
+            collected=models.Sum('amount', filter=models.Q(
+                status='paid', paid_date__gte=month, paid_date__lt=next_month)),
+            arrears=models.Sum('amount', filter=models.Q(status='overdue')),
+        ):
+            building_id = row.pop('building_id')
+            figures.setdefault(building_id, dict.fromkeys(cls.FIGURE_FIELDS, 0)).update(row)
+        
+        stored = {
+            rollup.building_id: rollup
+            for rollup in cls.objects.filter(building_id__in=list(figures), month=month)
+        }
+        now = timezone.now()
+        rollups = []
+        for building_id, values in figures.items():
+            rollup = stored.get(building_id) or cls(building_id=building_id, month=month)
+            for field, value in values.items():
+                setattr(rollup, field, value or 0)
+            rollup.updated_at = now
+            rollups.append(rollup)
+        
+        cls.objects.bulk_update([r for r in rollups if r.pk], list(cls.FIGURE_FIELDS) + ['updated_at'])
+        cls.objects.bulk_create([r for r in rollups if not r.pk], ignore_conflicts=True)
+        return rollups
+    
+    @classmethod
+    def for_buildings(cls, building_ids, month=None):
+        """
+        Map building id to its rollup for `month`, building any that are
+        missing. Once rows exist this is a single indexed read.
+        """
+        month = month or cls.current_month()
+        rollups = {
+            rollup.building_id: rollup
+            for rollup in cls.objects.filter(building_id__in=building_ids, month=month)
+        }
+        missing = [building_id for building_id in building_ids if building_id not in rollups]
+        if missing:
+            # Build from the primary's rows, not a replica that may lag behind
+            with primary_reads():
+                for rollup in cls.rebuild(month, missing):
+                    rollups[rollup.building_id] = rollup
+        return rollups
+
+
 class ManagementAlert(models.Model):
     building = models.ForeignKey(Building, on_delete=models.CASCADE, related_name='alerts')
     title = models.CharField(max_length=200)
@@ -114,15 +435,68 @@ class ManagementAlert(models.Model):
     
     def __str__(self):
         return self.title
+    
+    @staticmethod
+    def stream_channel(building_id):
+        return f'alerts:{building_id}'
+    
+    def stream_data(self):
+        return {'id': self.pk, 'title': self.title, 'message': self.message, 'created_at': self.created_at}
 
 class ContactUs(models.Model):
+    SEARCH_CONFIG = 'english'
+    # Private-use characters mark search hits in headlines, so the message
+    # text can be escaped before the hits are turned into <mark> tags
+    HIT_START, HIT_END = '\ue000', '\ue001'
+    
     name = models.CharField(max_length=100)
     email = models.EmailField()
     message = models.TextField()
-    submitted_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: spooled messages are saved later but keep the time they were sent
+    submitted_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Set on spooled messages, so replaying a spool batch can't save one twice
+    spool_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+    # Kept up to date by PostgreSQL on every write, bulk_create included
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('email', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('message', weight='B', config=SEARCH_CONFIG)
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+    
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='contactus_search_vector_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.message[:20]}"
+    
+    @classmethod
+    def search(cls, terms, queryset=None):
+        """
+        Messages matching `terms` (web search syntax: quoted phrases, `or`,
+        `-word`) through the GIN index, best matches first. Each row is
+        annotated with `rank` and a `headline` excerpt of its message.
+        """
+        queryset = cls.objects.all() if queryset is None else queryset
+        query = SearchQuery(terms, search_type='websearch', config=cls.SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(models.F('search_vector'), query),
+            headline=SearchHeadline(
+                'message', query, config=cls.SEARCH_CONFIG,
+                start_sel=cls.HIT_START, stop_sel=cls.HIT_END,
+                min_words=15, max_words=35,
+            ),
+        ).order_by('-rank', '-submitted_at')
+    
+    def highlighted_headline(self):
+        """The search headline as safe HTML with hits wrapped in <mark>."""
+        headline = escape(getattr(self, 'headline', None) or self.message)
+        return mark_safe(headline.replace(self.HIT_START, '<mark>').replace(self.HIT_END, '</mark>'))
 
 
 # Create user profile when a new user is created
@@ -130,3 +504,225 @@ class ContactUs(models.Model):
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
+
+# Requests load the user and profile from the cache (see
+# BigHouseWeb.backends), so any write to either drops the entry
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user_on_user_change(sender, instance, **kwargs):
+    UserProfile.forget_cached_users([instance.pk])
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def forget_cached_user_on_profile_change(sender, instance, **kwargs):
+    UserProfile.forget_cached_users([instance.user_id])
+
+
+# Keep the tenant's ledger in step with every payment write
+@receiver(post_save, sender=RentPayment)
+def refresh_ledger_on_payment_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        RentLedger.refresh_for_tenant(instance.tenant_id)
+
+@receiver(post_delete, sender=RentPayment)
+def refresh_ledger_on_payment_delete(sender, instance, **kwargs):
+    # Never create here: the tenant itself may be part of the same cascade
+    RentLedger.refresh_for_tenant(instance.tenant_id, create=False)
+
+
+# Profile pictures get fixed-size renditions built off the request thread
+@receiver(post_init, sender=UserProfile)
+def remember_profile_picture(sender, instance, **kwargs):
+    instance._saved_managed_building_id = instance.__dict__.get('managed_building_id')
+    # Read the raw value so a deferred field isn't loaded; None means unknown
+    if 'profile_picture' not in instance.__dict__:
+        instance._saved_picture = None
+    else:
+        value = instance.__dict__['profile_picture']
+        instance._saved_picture = getattr(value, 'name', value) or ''
+
+def profile_picture_changed(instance):
+    if instance._saved_picture is None:
+        return False
+    return (instance.profile_picture.name or '') != instance._saved_picture
+
+@receiver(pre_save, sender=UserProfile)
+def reset_renditions_on_picture_change(sender, instance, raw=False, **kwargs):
+    if not raw and profile_picture_changed(instance):
+        instance.renditions_ready = False
+
+@receiver(post_save, sender=UserProfile)
+def rebuild_renditions_on_picture_change(sender, instance, raw=False, **kwargs):
+    if raw or not profile_picture_changed(instance):
+        return
+    picture = instance.profile_picture.name or ''
+    if instance._saved_picture:
+        delete_renditions(instance._saved_picture)
+    if picture:
+        schedule_profile_renditions(instance.pk, picture)
+    instance._saved_picture = picture
+
+# Cached access scopes are keyed on scope_version, so bump it whenever a
+# user's role or the buildings they own or manage change
+@receiver(pre_save, sender=UserProfile)
+def bump_scope_version_on_profile_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    stored = 0
+    if not instance._state.adding:
+        # Bulk bumps may have moved the stored version past this instance's
+        # copy; reusing one would serve the scope cached under it
+        stored = UserProfile.objects.filter(pk=instance.pk).values_list('scope_version', flat=True).first() or 0
+    instance.scope_version = max(instance.scope_version, stored) + 1
+
+@receiver(pre_save, sender=Building)
+def bump_scope_version_on_owner_change(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    previous_owner = Building.objects.filter(pk=instance.pk).values_list('owner_id', flat=True).first()
+    if previous_owner != instance.owner_id:
+        UserProfile.bump_scope_versions(UserProfile.objects.filter(user_id=previous_owner))
+
+@receiver(post_save, sender=Building)
+@receiver(pre_delete, sender=Building)
+def bump_scope_version_on_building_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        UserProfile.bump_scope_versions(UserProfile.objects.filter(
+            models.Q(user_id=instance.owner_id) | models.Q(managed_building=instance)
+        ))
+
+# Anything written under a building bumps its change version, which
+# conditional GETs use to answer 304s cheaply, and refreshes its rollups.
+# The refresh waits for the transaction to commit, so however many rows a
+# transaction writes, each building's rollups are rebuilt once per month.
+pending_rollups = threading.local()
+
+def building_changed(building_id, paid_date=None):
+    if building_id is None:
+        return
+    Building.bump_versions([building_id])
+    if not hasattr(pending_rollups, 'months'):
+        pending_rollups.months = defaultdict(set)
+    months = {BuildingRollup.current_month()}
+    if paid_date:
+        months.add(paid_date.replace(day=1))
+    for month in months:
+        pending_rollups.months[month].add(building_id)
+    # Each write registers the callback, so one that survives a rolled-back
+    # savepoint still runs; the first to run takes everything pending
+    transaction.on_commit(rebuild_pending_rollups)
+
+def rebuild_pending_rollups():
+    months = getattr(pending_rollups, 'months', None)
+    if not months:
+        return
+    pending_rollups.months = defaultdict(set)
+    with transaction.atomic():
+        for month, building_ids in months.items():
+            if building_ids:
+                BuildingRollup.rebuild(month, building_ids)
+
+@receiver(post_delete, sender=Building)
+def forget_pending_rollups(sender, instance, **kwargs):
+    # Its houses and payments go first in the cascade, leaving a refresh
+    # that would recreate a rollup for the deleted building
+    for building_ids in getattr(pending_rollups, 'months', {}).values():
+        building_ids.discard(instance.pk)
+
+def tenant_building_id(tenant_id):
+    return Tenant.objects.filter(pk=tenant_id).values_list('house__building_id', flat=True).first()
+
+@receiver(post_save, sender=Building)
+def bump_version_on_building_save(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        Building.bump_versions([instance.pk])
+
+@receiver(post_save, sender=House)
+def building_changed_on_house_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        building_changed(instance.building_id)
+
+@receiver(post_delete, sender=House)
+def building_changed_on_house_delete(sender, instance, **kwargs):
+    building_changed(instance.building_id)
+
+@receiver(post_save, sender=Tenant)
+def building_changed_on_tenant_save(sender, instance, raw=False, **kwargs):
+    if not raw and instance.house_id:
+        building_changed(House.objects.filter(pk=instance.house_id).values_list('building_id', flat=True).first())
+
+@receiver(post_delete, sender=Tenant)
+def building_changed_on_tenant_delete(sender, instance, **kwargs):
+    if instance.house_id:
+        building_id = House.objects.filter(pk=instance.house_id).values_list('building_id', flat=True).first()
+        building_changed(building_id)
+
+@receiver(post_save, sender=RentPayment)
+def building_changed_on_payment_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        building_changed(tenant_building_id(instance.tenant_id), paid_date=instance.paid_date)
+
+@receiver(post_delete, sender=RentPayment)
+def building_changed_on_payment_delete(sender, instance, **kwargs):
+    building_changed(tenant_building_id(instance.tenant_id), paid_date=instance.paid_date)
+
+@receiver(post_save, sender=ManagementAlert)
+def bump_version_on_alert_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Building.bump_versions([instance.building_id])
+
+@receiver(post_delete, sender=ManagementAlert)
+def bump_version_on_alert_delete(sender, instance, **kwargs):
+    Building.bump_versions([instance.building_id])
+
+# Cached table rows are keyed on the building version. They also show
+# tenants' and owners' accounts, and building rows count managers, so
+# those writes bump the versions of the buildings that show them too
+@receiver(post_save, sender=User)
+def bump_versions_on_user_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Logging in only records last_login, which no table shows
+    if not raw and not created and update_fields != frozenset(['last_login']):
+        Building.bump_versions_for_users([instance.pk])
+
+@receiver(pre_save, sender=UserProfile)
+def find_buildings_showing_profile(sender, instance, raw=False, **kwargs):
+    instance._changed_building_ids = set()
+    if raw or instance._state.adding:
+        return
+    if instance.managed_building_id != instance._saved_managed_building_id:
+        instance._changed_building_ids.update([instance.managed_building_id, instance._saved_managed_building_id])
+    if profile_picture_changed(instance):
+        instance._changed_building_ids.update(
+            Tenant.objects.filter(user_id=instance.user_id).values_list('house__building_id', flat=True)
+        )
+    instance._changed_building_ids.discard(None)
+
+@receiver(post_save, sender=UserProfile)
+def bump_versions_on_profile_save(sender, instance, raw=False, **kwargs):
+    if not raw and instance._changed_building_ids:
+        Building.bump_versions(instance._changed_building_ids)
+    instance._saved_managed_building_id = instance.managed_building_id
+
+# Push alert changes to the building's live streams once they are committed.
+# Events carry the building version, which streams use as their event id.
+def publish_alert_event(building_id, event, data):
+    version = Building.objects.filter(pk=building_id).values_list('version', flat=True).first()
+    if version is not None:
+        get_broker().publish(ManagementAlert.stream_channel(building_id),
+                             {'event': event, 'id': version, 'data': data})
+
+@receiver(post_save, sender=ManagementAlert)
+def publish_alert_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw or (created and not instance.is_active):
+        return
+    if instance.is_active:
+        event, data = 'alert', instance.stream_data()
+    else:
+        event, data = 'alert_removed', {'id': instance.pk}
+    building_id = instance.building_id
+    transaction.on_commit(lambda: publish_alert_event(building_id, event, data))
+
+@receiver(post_delete, sender=ManagementAlert)
+def publish_alert_on_delete(sender, instance, **kwargs):
+    building_id, data = instance.building_id, {'id': instance.pk}
+    transaction.on_commit(lambda: publish_alert_event(building_id, 'alert_removed', data))
@@ -0,0 +1,158 @@
+# pubsub.py
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_broker = None
+
+
+def get_broker():
+    """The process-wide broker named by the PUBSUB_BROKER setting."""
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.PUBSUB_BROKER)()
+    return _broker
+
+
+class InProcessBroker:
+    """
+    Hands each published message to the asyncio subscribers of its channel
+    in this process. Enough when one ASGI process serves both the pages
+    that write and the streams that listen. Messages are JSON-ready dicts;
+    a None message tells subscribers they may have missed something and
+    should resync.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, message):
+        # May be called from any thread, e.g. a sync view's on_commit hook
+        self.deliver(channel, message)
+
+    def deliver(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    def deliver_all(self, message):
+        with self._lock:
+            channels = list(self._subscribers)
+        for channel in channels:
+            self.deliver(channel, message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        """Yield a queue receiving the channel's messages until the block exits."""
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers[channel].add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(subscriber)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Publishes through PostgreSQL NOTIFY so every worker process on the
+    host sees each message. Each process keeps one LISTEN connection in a
+    background thread, started on first subscribe, and fans notifications
+    out in-process. Messages too big for a NOTIFY payload go out as a
+    resync instead.
+    """
+
+    CHANNEL = 'bighouse_pubsub'
+    MAX_PAYLOAD = 7999
+    RECONNECT_DELAY = 1
+    READY_TIMEOUT = 10
+
+    def __init__(self):
+        super().__init__()
+        self._started = False
+        self._ready = threading.Event()
+
+    def publish(self, channel, message):
+        payload = json.dumps({'channel': channel, 'message': message}, cls=DjangoJSONEncoder)
+        if len(payload.encode()) > self.MAX_PAYLOAD:
+            payload = json.dumps({'channel': channel, 'message': None})
+        with connection.cursor() as cursor:
+            # Delivered when the surrounding transaction, if any, commits
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.CHANNEL, payload])
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        async with super().subscribe(channel) as queue:
+            if not self._ready.is_set():
+                self._start_listener()
+                # Until LISTEN is in place, anything published would be missed
+                ready = await asyncio.get_running_loop().run_in_executor(
+                    None, self._ready.wait, self.READY_TIMEOUT)
+                if not ready:
+                    queue.put_nowait(None)
+            yield queue
+
+    def _start_listener(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._listen_forever, name='pubsub-listener', daemon=True).start()
+
+    def _listen_forever(self):
+        while True:
+            try:
+                for payload in self._notifications():
+                    data = json.loads(payload)
+                    self.deliver(data['channel'], data['message'])
+            except Exception:
+                logger.exception('Lost the pub/sub LISTEN connection')
+            self._ready.clear()
+            # Subscribers resync once the listener is back
+            self.deliver_all(None)
+            time.sleep(self.RECONNECT_DELAY)
+
+    def _notifications(self):
+        """Yield NOTIFY payloads from a dedicated connection, with either psycopg driver."""
+        params = connection.get_connection_params()
+        if is_psycopg3:
+            import psycopg
+            with psycopg.connect(**params, autocommit=True) as listener:
+                listener.execute(f'LISTEN {self.CHANNEL}')
+                self._ready.set()
+                for notify in listener.notifies():
+                    yield notify.payload
+        else:
+            import psycopg2
+            listener = psycopg2.connect(**params)
+            try:
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.CHANNEL}')
+                self._ready.set()
+                while True:
+                    select.select([listener], [], [])
+                    listener.poll()
+                    while listener.notifies:
+                        yield listener.notifies.pop(0).payload
+            finally:
+                listener.close()
@@ -0,0 +1,96 @@
+# routers.py
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+# Set on responses to requests that wrote, so the browser's next requests
+# read their own writes from the primary while replicas catch up
+PIN_COOKIE = 'db_primary_pin'
+
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+class RequestState:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.replica_reads = False
+        self.wrote = False
+
+
+class ReplicaRouter:
+    """
+    Sends reads made by views marked with read_from_replica to a randomly
+    picked replica in DATABASE_REPLICAS. Everything else, including any
+    read after the request has written and reads from a browser that
+    wrote within DATABASE_REPLICA_PIN_SECONDS, uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if (settings.DATABASE_REPLICAS and state is not None and state.replica_reads
+                and not state.pinned and not state.wrote):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        # Saving the session on every request shouldn't pin the browser
+        if state is not None and model._meta.app_label != 'sessions':
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaPinMiddleware:
+    """Tracks each request's database state and pins browsers that just wrote."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        # Not reset afterwards: streamed responses keep reading as the view did
+        _request_state.set(state)
+        response = self.get_response(request)
+        if state.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside the block, e.g. to compute rows that get written back."""
+    state = _request_state.get()
+    if state is None or not state.replica_reads:
+        yield
+        return
+    state.replica_reads = False
+    try:
+        yield
+    finally:
+        state.replica_reads = True
+
+
+def read_from_replica(view):
+    """
+    Let a read-heavy view's GET and HEAD requests read from a replica.
+    Apply it outside decorators that query, such as condition(), so their
+    reads see the same copy of the data as the view.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = _request_state.get()
+        if state is not None and request.method in ('GET', 'HEAD'):
+            state.replica_reads = True
+        return view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,157 @@
+# synthetic.py
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .importer import copy_rows
+from .models import Building, BuildingRollup, House, ManagementAlert, RentLedger, RentPayment, Tenant, UserProfile
+
+# Buildings, houses per building and months of rent history for each size
+PRESETS = {
+    'small': {'buildings': 20, 'houses_per_building': 20, 'months': 12},
+    'medium': {'buildings': 500, 'houses_per_building': 40, 'months': 24},
+    'large': {'buildings': 2500, 'houses_per_building': 40, 'months': 36},
+}
+BUILDINGS_PER_OWNER = 50
+# One building in this many has a manager
+MANAGER_EVERY = 5
+OCCUPANCY = 0.92
+ON_TIME = 0.9
+STREETS = ['Main St', 'Oak Ave', 'Lake Rd', 'Hill St', 'Park Ln', 'River Rd', 'Elm St', 'Station Rd']
+ALERTS = [
+    ('Water shut-off', 'Water will be off on Tuesday from 9am to noon for repairs.'),
+    ('Lift maintenance', 'The lift is out of service on Friday while it is inspected.'),
+    ('Pest control', 'Pest control will treat the common areas this week.'),
+    ('Rent reminder', 'Rent is due on the first of the month.'),
+]
+
+
+class SyntheticPortfolio:
+    """
+    Deterministic fake data for load testing. Every building draws from its
+    own random stream, seeded from `seed` and the building's index, so a
+    given seed yields the same portfolio however the buildings are split
+    between workers. Accounts get `password_hash`, hashed once by the
+    caller, or an unusable password.
+    """
+
+    def __init__(self, prefix, seed, houses_per_building, months, until, password_hash='!'):
+        self.prefix = prefix
+        self.seed = seed
+        self.houses_per_building = houses_per_building
+        self.months = months
+        self.until = until
+        self.password_hash = password_hash
+        self.use_copy = connection.vendor == 'postgresql'
+
+    def username(self, kind, *parts):
+        return '-'.join([self.prefix, kind] + [str(part) for part in parts])
+
+    def create_owners(self, buildings):
+        """Create one owner per BUILDINGS_PER_OWNER buildings; returns their ids in order."""
+        count = -(-buildings // BUILDINGS_PER_OWNER)
+        users = User.objects.bulk_create([
+            User(username=self.username('owner', n), email=f'{self.username("owner", n)}@example.com',
+                 password=self.password_hash)
+            for n in range(count)
+        ])
+        UserProfile.objects.bulk_create([UserProfile(user=user, user_type='owner') for user in users])
+        return [user.pk for user in users]
+
+    def create_buildings(self, indexes, owner_ids):
+        """
+        Create the buildings at `indexes` with everything under them in one
+        transaction. Returns counts of the rows created by model name.
+        """
+        periods = [self.until - relativedelta(months=n) for n in reversed(range(self.months))]
+        with transaction.atomic():
+            streams = {index: random.Random(self.seed * 1_000_003 + index) for index in indexes}
+            buildings = Building.objects.bulk_create([
+                Building(
+                    name=f'{self.prefix} building {index}',
+                    address=f'{streams[index].randint(1, 999)} {streams[index].choice(STREETS)}',
+                    owner_id=owner_ids[index // BUILDINGS_PER_OWNER],
+                )
+                for index in indexes
+            ])
+            index_of = {building.pk: index for index, building in zip(indexes, buildings)}
+            houses = House.objects.bulk_create([
+                House(
+                    building=building, house_number=str(n + 1),
+                    rent_amount=Decimal(streams[index].randrange(600, 3000, 25)),
+                    is_occupied=streams[index].random() < OCCUPANCY,
+                )
+                for index, building in zip(indexes, buildings)
+                for n in range(self.houses_per_building)
+            ])
+            occupied = [house for house in houses if house.is_occupied]
+
+            users = User.objects.bulk_create(
+                [User(username=self.username('tenant', index_of[house.building_id], house.house_number),
+                      password=self.password_hash) for house in occupied]
+                + [User(username=self.username('manager', index), password=self.password_hash)
+                   for index in indexes if index % MANAGER_EVERY == 0]
+            )
+            tenant_users, manager_users = users[:len(occupied)], users[len(occupied):]
+            managed = [building for index, building in zip(indexes, buildings) if index % MANAGER_EVERY == 0]
+            UserProfile.objects.bulk_create(
+                [UserProfile(user=user, user_type='tenant') for user in tenant_users]
+                + [UserProfile(user=user, user_type='manager', managed_building=building)
+                   for user, building in zip(manager_users, managed)]
+            )
+            tenants = Tenant.objects.bulk_create([
+                Tenant(user=user, house=house) for user, house in zip(tenant_users, occupied)
+            ])
+
+            payments = []
+            for tenant, house in zip(tenants, occupied):
+                payments.extend(self.payment_rows(tenant.pk, house.rent_amount, periods,
+                                                  streams[index_of[house.building_id]]))
+            self.insert(RentPayment, ['tenant_id', 'amount', 'due_date', 'paid_date', 'status', 'period'], payments)
+
+            alerts = []
+            for index, building in zip(indexes, buildings):
+                rng = streams[index]
+                for _ in range(rng.randint(0, 3)):
+                    title, message = rng.choice(ALERTS)
+                    created_at = timezone.make_aware(datetime.combine(
+                        self.until - timedelta(days=rng.randint(0, 90)), time(9)))
+                    alerts.append([building.pk, title, message, created_at, rng.random() < 0.7])
+            self.insert(ManagementAlert, ['building_id', 'title', 'message', 'created_at', 'is_active'], alerts)
+
+            # Bulk writes skip the signals that keep these current
+            RentLedger.rebuild_for_tenants([tenant.pk for tenant in tenants])
+            BuildingRollup.rebuild(BuildingRollup.current_month(), [building.pk for building in buildings])
+
+        return {'buildings': len(buildings), 'houses': len(houses), 'tenants': len(tenants),
+                'managers': len(manager_users), 'payments': len(payments), 'alerts': len(alerts)}
+
+    @staticmethod
+    def payment_rows(tenant_id, rent_amount, periods, rng):
+        """One invoice per month; past months mostly paid, some late or overdue, the last one due."""
+        rows = []
+        for period in periods[:-1]:
+            roll = rng.random()
+            if roll < ON_TIME:
+                rows.append([tenant_id, rent_amount, period, period + timedelta(days=rng.randint(0, 4)),
+                             'paid', period])
+            elif roll < ON_TIME + (1 - ON_TIME) / 2:
+                rows.append([tenant_id, rent_amount, period, period + timedelta(days=rng.randint(10, 40)),
+                             'paid', period])
+            else:
+                rows.append([tenant_id, rent_amount, period, None, 'overdue', period])
+        rows.append([tenant_id, rent_amount, periods[-1], None, 'due', periods[-1]])
+        return rows
+
+    def insert(self, model, fields, rows):
+        if not rows:
+            return
+        if self.use_copy:
+            copy_rows(model, fields, rows)
+        else:
+            model.objects.bulk_create([model(**dict(zip(fields, row))) for row in rows])
@@ -1,3 +1,1403 @@
-from django.test import TestCase
+from base64 import urlsafe_b64decode
+from datetime import date
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+import asyncio
+import bisect
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from dateutil.relativedelta import relativedelta
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
+
+from accounts import urls as accounts_urls
+
+from .access import get_access_scope
+from .benchmarks import BENCHMARKS, format_report, open_event_stream, run_benchmark, seed_benchmark_portfolio
+from .contact_spool import flush_spool
+from .deletion import delete_building_in_chunks, start_building_deletion
+from .metrics import QUERY_COUNT, REQUEST_SECONDS
+from .pubsub import get_broker
+from .images import (
+    RENDITIONS, build_profile_renditions, build_renditions_in_worker, rendition_name, rendition_source,
+)
+from .routers import PIN_COOKIE, ReplicaPinMiddleware, primary_reads, read_from_replica
+from . import urls as app_urls, views
+from .models import (
+    Building, BuildingRollup, ContactUs, House, ManagementAlert, Tenant, RentPayment, RentLedger, UserProfile,
+    pending_rollups, rebuild_pending_rollups,
+)
+from .views import DASHBOARD_PAGE_SIZE
+
+# The async tenant views are only routed under ASGI, so mount them here too
+urlpatterns = [
+    path('async/profile/', views.async_profile_view),
+    path('async/rent-status/', views.async_rent_status_view),
+    path('', include('BigHouseProject.urls')),
+]
+
+
+class BigHouseTestCase(TestCase):
+    def setUp(self):
+        # Cached access scopes and table fragments are keyed by ids and
+        # versions, which test rollbacks reuse
+        cache.clear()
+        # Rollups are rebuilt on commit, which test transactions never reach
+        pending_rollups.__dict__.clear()
+
+    def make_owner(self, username='owner', login=False):
+        """An owner with the password 'pw', signed in if `login` is set."""
+        owner = User.objects.create_user(username, password='pw')
+        owner.userprofile.user_type = 'owner'
+        owner.userprofile.save()
+        if login:
+            self.client.force_login(owner)
+        return owner
+
+
+def seed_portfolio(owner, building_count, houses_per_building, prefix='b'):
+    """Create buildings with occupied houses, one tenant and payment each."""
+    for b in range(building_count):
+        building = Building.objects.create(name=f'{prefix}{b}', address='1 Main St', owner=owner)
+        houses = House.objects.bulk_create([
+            House(building=building, house_number=str(n), rent_amount=Decimal('1000.00'), is_occupied=True)
+            for n in range(houses_per_building)
+        ])
+        for house in houses:
+            user = User.objects.create(username=f'{prefix}{b}-t{house.house_number}')
+            tenant = Tenant.objects.create(user=user, house=house)
+            RentPayment.objects.create(
+                tenant=tenant, amount=house.rent_amount, due_date=date(2025, 1, 1), status='due'
+            )
+    # As if the seeding had committed
+    rebuild_pending_rollups()
+
+
+class ManagementDashboardQueryTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_owner(login=True)
+
+    def dashboard_query_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('management_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx), response
+
+    def test_query_count_does_not_grow_with_portfolio(self):
+        seed_portfolio(self.owner, 1, 2, prefix='small')
+        small_count, _ = self.dashboard_query_count()
+
+        seed_portfolio(self.owner, 5, 40, prefix='large')
+        large_count, response = self.dashboard_query_count()
+
+        self.assertEqual(large_count, small_count)
+        self.assertLessEqual(large_count, 12)
+        self.assertContains(response, 'Mark Paid', count=DASHBOARD_PAGE_SIZE)
+
+    def test_latest_payment_is_annotated(self):
+        seed_portfolio(self.owner, 1, 1)
+        tenant = Tenant.objects.get()
+        earlier = RentPayment.objects.get()
+        latest = RentPayment.objects.create(
+            tenant=tenant, amount=Decimal('1000.00'), due_date=date(2025, 2, 1), status='overdue'
+        )
+        _, response = self.dashboard_query_count()
+        badge = re.search(r'<span class="badge badge-\w+">\s*(\w+)\s*</span>\s*<button[^>]*markRentPaid\((\d+)\)',
+                          response.content.decode())
+        self.assertEqual(badge.groups(), ('Overdue', str(latest.id)))
+        self.assertNotContains(response, f'markRentPaid({earlier.id})')
+
+
+class DashboardPaginationTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_owner(login=True)
+        seed_portfolio(self.owner, 3, 30)
+
+    def fetch_all(self, table, **params):
+        url = reverse('dashboard_rows', args=[table])
+        pages = []
+        cursor = None
+        while True:
+            query = dict(params, cursor=cursor) if cursor else params
+            data = self.client.get(url, query).json()
+            pages.append(data['html'])
+            cursor = data['next_cursor']
+            if not cursor:
+                return pages
+
+    def test_keyset_pages_cover_every_row_once(self):
+        pages = self.fetch_all('tenants')
+        self.assertEqual(len(pages), 2)
+        html = ''.join(pages)
+        self.assertEqual(html.count('Remove Tenant'), 90)
+        for tenant in Tenant.objects.all():
+            self.assertEqual(html.count(f'confirmDelete({tenant.id})'), 1)
+
+    def test_cursor_survives_its_row_being_deleted(self):
+        url = reverse('dashboard_rows', args=['houses'])
+        first = self.client.get(url).json()
+        building_id, house_number = json.loads(urlsafe_b64decode(first['next_cursor']))
+        House.objects.get(building_id=building_id, house_number=house_number).delete()
+
+        html = ''.join(self.fetch_all('houses', cursor=first['next_cursor']))
+        self.assertEqual(html.count('<tr>'), 40)
+        for house in House.objects.select_related('building'):
+            row = f'<td>{house.building.name}</td>\n    <td>{house.house_number}</td>'
+            self.assertEqual(html.count(row) + first['html'].count(row), 1)
+
+    def test_filters_apply_in_database(self):
+        building = Building.objects.get(name='b1')
+        House.objects.filter(building=building, house_number__in=['1', '2']).update(is_occupied=False)
+        pages = self.fetch_all('houses', building=building.id, occupancy='available')
+        self.assertEqual(''.join(pages).count('<tr>'), 2)
+
+        RentPayment.objects.filter(tenant__house__house_number='5').update(status='overdue')
+        pages = self.fetch_all('tenants', rent_status='overdue')
+        self.assertEqual(''.join(pages).count('<tr>'), 3)
+
+    def test_other_owners_rows_are_hidden(self):
+        other = User.objects.create_user('other', password='pw')
+        seed_portfolio(other, 1, 5, prefix='other')
+        html = ''.join(self.fetch_all('houses'))
+        self.assertNotIn('other0', html)
+
+    def test_unknown_table_is_not_found(self):
+        response = self.client.get(reverse('dashboard_rows', args=['payments']))
+        self.assertEqual(response.status_code, 404)
+
+
+class FragmentCacheTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_owner(login=True)
+        seed_portfolio(self.owner, 2, 3)
+        self.building = Building.objects.get(name='b0')
+
+    def get(self, name):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in ctx.captured_queries]
+
+    def rendered_ids(self, queries):
+        # Primary keys of the table rows rendered rather than read from the cache
+        ids = {}
+        for sql in queries:
+            for table in ('house', 'tenant'):
+                match = re.search(rf'"BigHouseWeb_{table}"."id" IN \(([\d, ]+)\)', sql)
+                if match:
+                    ids.setdefault(table, set()).update(int(pk) for pk in match.group(1).split(', '))
+        return ids
+
+    def test_warm_tables_render_nothing(self):
+        _, cold = self.get('management_dashboard')
+        self.assertEqual({table: len(ids) for table, ids in self.rendered_ids(cold).items()},
+                         {'house': 6, 'tenant': 6})
+        response, warm = self.get('management_dashboard')
+        self.assertEqual(self.rendered_ids(warm), {})
+        self.assertContains(response, 'Remove Tenant', count=6)
+
+        _, cold = self.get('admin_management')
+        _, warm = self.get('admin_management')
+        self.assertLess(len(warm), len(cold))
+        self.assertFalse(any('BigHouseWeb_buildingrollup' in sql for sql in warm))
+
+    def test_cold_page_renders_only_its_rows(self):
+        seed_portfolio(self.owner, 1, DASHBOARD_PAGE_SIZE + 20, prefix='big')
+        _, queries = self.get('management_dashboard')
+        self.assertEqual(len(self.rendered_ids(queries)['house']), DASHBOARD_PAGE_SIZE)
+
+    def test_write_rerenders_only_its_building(self):
+        self.get('management_dashboard')
+        tenant = Tenant.objects.filter(house__building=self.building).first()
+        RentPayment.objects.create(
+            tenant=tenant, amount=Decimal('1000.00'), due_date=date(2025, 2, 1),
+            paid_date=date(2025, 2, 1), status='paid'
+        )
+        response, queries = self.get('management_dashboard')
+        # Both tables re-render the changed building's rows, and only those
+        self.assertEqual(self.rendered_ids(queries), {
+            'house': set(House.objects.filter(building=self.building).values_list('pk', flat=True)),
+            'tenant': set(Tenant.objects.filter(house__building=self.building).values_list('pk', flat=True)),
+        })
+        self.assertContains(response, 'Mark Paid', count=5)
+
+    def test_adding_a_house_skips_building_the_page(self):
+        data = {'add_house': '1', 'building': self.building.pk, 'house_number': '99', 'rent_amount': '900.00'}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('management_dashboard'), data)
+        self.assertRedirects(response, reverse('management_dashboard'), fetch_redirect_response=False)
+        self.assertTrue(House.objects.filter(building=self.building, house_number='99').exists())
+        self.assertEqual(self.rendered_ids([query['sql'] for query in ctx.captured_queries]), {})
+
+        # An invalid form is shown again on the full page
+        data['house_number'] = ''
+        response = self.client.post(reverse('management_dashboard'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Remove Tenant', count=6)
+
+    def test_account_changes_invalidate_rows(self):
+        self.get('management_dashboard')
+        tenant = Tenant.objects.filter(house__building=self.building).select_related('user').first()
+        tenant.user.first_name, tenant.user.last_name = 'Ada', 'Lovelace'
+        tenant.user.save()
+        self.assertContains(self.get('management_dashboard')[0], 'Ada Lovelace')
+
+        self.get('admin_management')
+        manager = User.objects.create_user('manager')
+        manager.userprofile.user_type = 'manager'
+        manager.userprofile.managed_building = self.building
+        manager.userprofile.save()
+        response, _ = self.get('admin_management')
+        self.assertEqual(
+            [row.count('<td>1</td>') for row in response.context['building_rows']], [1, 0]
+        )
+
+    def test_logging_in_keeps_fragments(self):
+        version = self.building.version
+        self.client.login(username='owner', password='pw')
+        self.building.refresh_from_db()
+        self.assertEqual(self.building.version, version)
+
+
+class BuildingDeletionTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_owner()
+        seed_portfolio(self.owner, 2, 5)
+        self.building = Building.objects.get(name='b0')
+        ManagementAlert.objects.bulk_create([
+            ManagementAlert(building=self.building, title=f'Notice {n}', message='Water off') for n in range(3)
+        ])
+        self.manager = User.objects.create_user('manager')
+        self.manager.userprofile.user_type = 'manager'
+        self.manager.userprofile.managed_building = self.building
+        self.manager.userprofile.save()
+        self.client.force_login(self.owner)
+
+    def test_request_marks_building_and_schedules_deletion(self):
+        with mock.patch('BigHouseWeb.deletion.deletion_executor') as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(reverse('delete_building', args=[self.building.pk]))
+        self.assertRedirects(response, reverse('admin_management'), fetch_redirect_response=False)
+        executor.submit.assert_called_once()
+
+        self.building.refresh_from_db()
+        self.assertTrue(self.building.deleting)
+        self.assertEqual(self.building.houses_to_delete, 5)
+        self.assertEqual(House.objects.filter(building=self.building).count(), 5)
+        profile = self.manager.userprofile
+        profile.refresh_from_db()
+        self.assertEqual((profile.user_type, profile.managed_building), ('tenant', None))
+
+        response = self.client.get(reverse('admin_management'))
+        self.assertContains(response, 'Deleting: 0 of 5 houses')
+        self.assertNotContains(response, f'confirmDelete({self.building.pk})')
+
+    def test_failed_marking_keeps_managers_and_schedules_nothing(self):
+        with mock.patch('BigHouseWeb.deletion.deletion_executor') as executor, \
+                mock.patch('BigHouseWeb.deletion.timezone.now', side_effect=DatabaseError):
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(DatabaseError):
+                    start_building_deletion(self.building)
+        executor.submit.assert_not_called()
+        profile = self.manager.userprofile
+        profile.refresh_from_db()
+        self.assertEqual((profile.user_type, profile.managed_building), ('manager', self.building))
+
+    def test_chunks_remove_dependents_then_building(self):
+        start_building_deletion(self.building)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(delete_building_in_chunks(self.building.pk, chunk_size=2))
+        self.assertEqual(sum(sql['sql'].startswith('DELETE FROM "BigHouseWeb_house"') for sql in ctx.captured_queries), 3)
+
+        self.assertFalse(Building.objects.filter(pk=self.building.pk).exists())
+        self.assertFalse(House.objects.filter(building_id=self.building.pk).exists())
+        self.assertFalse(ManagementAlert.objects.filter(building_id=self.building.pk).exists())
+        # Tenants stay, without a house, as the cascade left them
+        self.assertEqual(Tenant.objects.filter(house__isnull=True).count(), 5)
+        self.assertEqual(House.objects.count(), 5)
+
+    def test_only_buildings_marked_for_deletion_are_deleted(self):
+        self.assertFalse(delete_building_in_chunks(self.building.pk))
+        self.assertEqual(House.objects.filter(building=self.building).count(), 5)
+
+    def test_command_resumes_interrupted_deletions(self):
+        start_building_deletion(self.building)
+        call_command('delete_pending_buildings', stdout=StringIO())
+        self.assertFalse(Building.objects.filter(pk=self.building.pk).exists())
+
+
+class RentLedgerTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create_user('owner', password='pw')
+        seed_portfolio(owner, 1, 1)
+        self.tenant = Tenant.objects.select_related('house').get()
+        self.client.force_login(self.tenant.user)
+
+    def test_ledger_follows_payment_writes(self):
+        ledger = RentLedger.objects.get(tenant=self.tenant)
+        self.assertEqual(ledger.status, 'due')
+        self.assertEqual(ledger.outstanding, Decimal('1000.00'))
+
+        self.client.post(reverse('process_payment'), {'amount': '2500.00'})
+        ledger.refresh_from_db()
+        paid = RentPayment.objects.get(status='paid')
+        self.assertEqual(ledger.paid_through, paid.paid_date + relativedelta(months=+2))
+        self.assertEqual(ledger.credit, Decimal('500.00'))
+
+        RentPayment.objects.filter(status='due').get().delete()
+        ledger.refresh_from_db()
+        self.assertEqual(ledger.outstanding, Decimal('0'))
+
+    def test_rent_status_reads_ledger(self):
+        self.client.post(reverse('process_payment'), {'amount': '1500.00'})
+        response = self.client.get(reverse('rent_status'))
+        self.assertEqual(response.context['partial_payment_info']['amount'], Decimal('500.00'))
+
+    def test_rebuild_command_repairs_drift(self):
+        RentLedger.objects.filter(tenant=self.tenant).update(outstanding=Decimal('1.00'))
+        out = StringIO()
+        call_command('rebuild_rent_ledger', '--check', stdout=out)
+        self.assertIn('1 drifted', out.getvalue())
+
+        call_command('rebuild_rent_ledger', stdout=StringIO())
+        self.assertEqual(RentLedger.objects.get().outstanding, Decimal('1000.00'))
+
+    def test_deleting_tenant_removes_ledger(self):
+        self.tenant.delete()
+        self.assertFalse(RentLedger.objects.exists())
+
+
+class GenerateRentInvoicesTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create_user('owner', password='pw')
+        seed_portfolio(owner, 3, 4)
+        House.objects.filter(house_number='0').update(is_occupied=False)
+
+    def test_invoices_once_per_occupied_house(self):
+        out = StringIO()
+        call_command('generate_rent_invoices', '--period', '2026-03', '--due-day', '5', stdout=out)
+        self.assertIn('Created 9 rent invoices', out.getvalue())
+        call_command('generate_rent_invoices', '--period', '2026-03', stdout=out)
+
+        invoices = RentPayment.objects.filter(period=date(2026, 3, 1))
+        self.assertEqual(invoices.count(), 9)
+        self.assertTrue(all(invoice.due_date == date(2026, 3, 5) for invoice in invoices))
+        ledger = RentLedger.objects.get(tenant=invoices[0].tenant)
+        self.assertEqual(ledger.latest_due_date, date(2026, 3, 5))
+        self.assertEqual(ledger.outstanding, Decimal('2000.00'))
+
+    def test_shards_partition_buildings(self):
+        from .management.commands.generate_rent_invoices import generate_invoices
+        period = date(2026, 4, 1)
+        created = [generate_invoices(period, period, 2, shard, 2) for shard in range(2)]
+        self.assertEqual(sum(created), 9)
+        self.assertTrue(all(created))
+
+    def test_invoices_inserted_by_a_concurrent_run_are_not_counted(self):
+        from .management.commands import generate_rent_invoices
+        period = date(2026, 5, 1)
+        tenants = list(Tenant.objects.filter(house__is_occupied=True)
+                       .values_list('pk', 'house__rent_amount', 'house__building_id')[:3])
+        insert = generate_rent_invoices.insert_ignoring_conflicts
+
+        def race(*args):
+            # Another run invoices the first tenant between our check and our insert
+            RentPayment.objects.create(tenant_id=tenants[0][0], amount=1, due_date=period,
+                                       period=period, status='due')
+            return insert(*args)
+
+        with mock.patch.object(generate_rent_invoices, 'insert_ignoring_conflicts', side_effect=race):
+            self.assertEqual(generate_rent_invoices.insert_invoices(tenants, period, period), 2)
+        self.assertEqual(RentPayment.objects.filter(period=period).count(), 3)
+        self.assertEqual(RentPayment.objects.get(tenant_id=tenants[0][0], period=period).amount, 1)
+
+
+class CreateUserProfilesTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        User.objects.bulk_create([User(username=f'imported-{n}') for n in range(5)])
+        self.with_profile = User.objects.create_user('signed-up')
+        self.with_profile.userprofile.user_type = 'owner'
+        self.with_profile.userprofile.save()
+
+    def test_dry_run_only_counts(self):
+        out = StringIO()
+        call_command('create_user_profiles', '--dry-run', stdout=out)
+        self.assertIn('5 users have no profile', out.getvalue())
+        self.assertEqual(User.objects.filter(userprofile__isnull=True).count(), 5)
+
+    def test_backfills_in_batches(self):
+        out = StringIO()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('create_user_profiles', '--batch-size', '2', '--verbosity', '2', stdout=out)
+        self.assertEqual(sum(q['sql'].startswith('INSERT') for q in ctx.captured_queries), 3)
+        self.assertIn('4/5 users processed', out.getvalue())
+        self.assertIn('Successfully processed 5 users without a profile', out.getvalue())
+        self.assertFalse(User.objects.filter(userprofile__isnull=True).exists())
+        self.with_profile.userprofile.refresh_from_db()
+        self.assertEqual(self.with_profile.userprofile.user_type, 'owner')
+
+    def test_batch_size_must_be_positive(self):
+        with self.assertRaisesMessage(CommandError, '--batch-size must be at least 1'):
+            call_command('create_user_profiles', '--batch-size', '0', stdout=StringIO())
+
+
+class ImportPortfolioTests(BigHouseTestCase):
+    ROWS = [
+        {'type': 'building', 'building': 'Elm', 'address': '2 Elm St', 'owner': 'owner'},
+        {'type': 'house', 'building': 'Elm', 'owner': 'owner', 'house_number': '1', 'rent_amount': '900'},
+        {'type': 'house', 'building': 'Elm', 'owner': 'owner', 'house_number': '2', 'rent_amount': '950'},
+        {'type': 'tenant', 'building': 'Elm', 'owner': 'owner', 'house_number': '1',
+         'username': 'ann', 'email': 'ann@example.com'},
+        {'type': 'balance', 'username': 'ann', 'amount': '900', 'due_date': '2025-01-01', 'status': 'overdue'},
+    ]
+
+    def setUp(self):
+        super().setUp()
+        User.objects.create_user('owner', password='pw')
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def write(self, rows, name='portfolio.jsonl'):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w') as f:
+            f.writelines(json.dumps(row) + '\n' for row in rows)
+        return path
+
+    def test_imports_in_small_batches(self):
+        out = StringIO()
+        call_command('import_portfolio', self.write(self.ROWS), '--batch-size', '2', stdout=out)
+        self.assertIn('1 buildings, 2 houses, 1 tenants, 1 balances', out.getvalue())
+
+        tenant = Tenant.objects.select_related('house', 'user__userprofile').get(user__username='ann')
+        self.assertTrue(tenant.house.is_occupied)
+        self.assertEqual(tenant.user.userprofile.user_type, 'tenant')
+        self.assertEqual(RentLedger.for_tenant(tenant).status, 'overdue')
+        rollup = BuildingRollup.objects.get(building=tenant.house.building)
+        self.assertEqual((rollup.house_count, rollup.occupied_count), (2, 1))
+
+    def test_invalid_rows_roll_everything_back(self):
+        rows = self.ROWS + [
+            {'type': 'house', 'building': 'Oak', 'owner': 'owner', 'house_number': '1', 'rent_amount': '900'},
+            {'type': 'balance', 'username': 'ann', 'amount': 'lots', 'due_date': '2025-01-01'},
+        ]
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('import_portfolio', self.write(rows), stdout=StringIO(), stderr=err)
+        self.assertIn("Line 6: unknown building 'Oak' of 'owner'", err.getvalue())
+        self.assertIn('Line 7: amount must be a number', err.getvalue())
+        self.assertFalse(Building.objects.exists())
+
+    def test_bad_values_are_reported_per_row(self):
+        house = {'type': 'house', 'building': 'Elm', 'owner': 'owner', 'rent_amount': '900'}
+        rows = self.ROWS[:1] + [
+            {**house, 'house_number': '1', 'rent_amount': 'NaN'},
+            {**house, 'house_number': '2', 'rent_amount': '-Infinity'},
+            {**house, 'house_number': '3', 'rent_amount': '1e30'},
+            {**house, 'house_number': '4', 'rent_amount': '123456789'},
+            {**house, 'house_number': '5', 'rent_amount': '99999999.999'},
+            {**house, 'house_number': 6, 'rent_amount': 99999999.99},
+            [1, 2],
+        ]
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('import_portfolio', self.write(rows), stdout=StringIO(), stderr=err)
+        self.assertIn('Line 2: rent_amount must be a number', err.getvalue())
+        self.assertIn('Line 3: rent_amount must be a number', err.getvalue())
+        for line in (4, 5, 6):
+            self.assertIn(f'Line {line}: rent_amount must be less than 100000000', err.getvalue())
+        self.assertNotIn('Line 7', err.getvalue())
+        self.assertIn('Line 8: each line must be a JSON object', err.getvalue())
+
+    def test_buildings_are_resolved_by_owner_and_name(self):
+        other = User.objects.create_user('other')
+        Building.objects.create(name='Elm', address='9 Elm Rd', owner=other)
+        call_command('import_portfolio', self.write(self.ROWS), stdout=StringIO())
+
+        self.assertEqual(Building.objects.filter(name='Elm').count(), 2)
+        self.assertFalse(House.objects.filter(building__owner=other).exists())
+        self.assertEqual(Tenant.objects.get(user__username='ann').house.building.owner.username, 'owner')
+
+    def test_ambiguous_building_is_reported(self):
+        owner = User.objects.get(username='owner')
+        Building.objects.create(name='Elm', address='2 Elm St', owner=owner)
+        Building.objects.create(name='Elm', address='3 Elm St', owner=owner)
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('import_portfolio', self.write(self.ROWS[1:2]), stdout=StringIO(), stderr=err)
+        self.assertIn("Line 1: 'owner' has more than one building 'Elm'", err.getvalue())
+
+    def test_admin_upload(self):
+        admin = User.objects.create_superuser('admin', password='pw')
+        self.client.force_login(admin)
+        header = 'type,building,address,owner,house_number,rent_amount\n'
+        upload = SimpleUploadedFile('portfolio.csv', (header + 'building,Elm,2 Elm St,owner,,\n'
+                                                      'house,Elm,,owner,1,900\n').encode())
+        response = self.client.post(reverse('admin:BigHouseWeb_building_import'), {'file': upload})
+        self.assertRedirects(response, reverse('admin:BigHouseWeb_building_changelist'))
+        self.assertEqual(House.objects.get().building.name, 'Elm')
+
+
+class ExportTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_owner()
+        seed_portfolio(self.owner, 2, 3)
+        seed_portfolio(User.objects.create_user('other'), 1, 2, prefix='x')
+        self.client.force_login(self.owner)
+
+    def export(self, dataset, file_format, **params):
+        response = self.client.get(reverse('export_data', args=[dataset, file_format]), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_payments_csv_is_scoped_and_filtered(self):
+        RentPayment.objects.filter(tenant__user__username='b0-t0').update(due_date=date(2024, 6, 1))
+        lines = self.export('payments', 'csv').splitlines()
+        self.assertTrue(lines[0].startswith('id,tenant__house__building__name'))
+        self.assertEqual(len(lines), 7)
+        self.assertFalse(any(',x0,' in line for line in lines))
+
+        lines = self.export('payments', 'csv', **{'from': '2025-01-01', 'status': 'due'}).splitlines()
+        self.assertEqual(len(lines), 6)
+
+    def test_rent_roll_jsonl(self):
+        rows = [json.loads(line) for line in self.export('rent-roll', 'jsonl').splitlines()]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]['building__name'], 'b0')
+        self.assertEqual(rows[0]['tenant__ledger__status'], 'due')
+
+    def test_bad_date_is_rejected(self):
+        response = self.client.get(reverse('export_data', args=['payments', 'csv']), {'to': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ContactSpoolTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_dir)
+        overrides = self.settings(CONTACT_SPOOL_DIR=spool_dir, CONTACT_SPOOL_MAX_MESSAGES=3,
+                                  CONTACT_SPOOL_MAX_AGE=3600, CONTACT_RATE_LIMIT=4)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        # Keep queued flushes to run here, in the test transaction, which
+        # the worker's closing of its connections would break
+        self.flushes = []
+        executor = mock.patch('BigHouseWeb.contact_spool.flush_executor').start()
+        executor.submit.side_effect = self.flushes.append
+        self.connections = mock.patch('BigHouseWeb.contact_spool.connections').start()
+        mock.patch.dict('BigHouseWeb.contact_spool._spooled', count=0, oldest=None).start()
+        self.addCleanup(mock.patch.stopall)
+        self.addCleanup(self.run_flushes)
+
+    def run_flushes(self):
+        while self.flushes:
+            self.flushes.pop(0)()
+
+    def post(self, n, ip='10.0.0.1'):
+        return self.client.post(reverse('contact_us'), {
+            'name': f'Sender {n}', 'email': 'sender@example.com', 'message': 'Hello',
+        }, REMOTE_ADDR=ip)
+
+    def test_messages_are_spooled_then_flushed_in_bulk(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.post(0).status_code, 200)
+            self.post(1)
+        self.assertFalse(ContactUs.objects.exists())
+
+        # The request that fills the spool only queues the flush
+        with self.assertNumQueries(0):
+            self.post(2)
+        self.assertEqual(len(self.flushes), 1)
+        self.assertFalse(ContactUs.objects.exists())
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.run_flushes()
+        self.assertEqual(ContactUs.objects.count(), 3)
+        self.assertEqual(sum('INSERT' in q['sql'] for q in ctx.captured_queries), 1)
+        self.connections.close_all.assert_called_once_with()
+
+        self.post(3)
+        out = StringIO()
+        call_command('flush_contact_spool', stdout=out)
+        self.assertIn('Saved 1 contact messages', out.getvalue())
+        self.assertEqual(ContactUs.objects.count(), 4)
+
+    def test_batch_replayed_after_a_crash_is_saved_once(self):
+        for n in range(2):
+            self.post(n)
+        with mock.patch('BigHouseWeb.contact_spool.os.remove', side_effect=OSError):
+            with self.assertRaises(OSError):
+                flush_spool()
+        self.assertEqual(ContactUs.objects.count(), 2)
+
+        self.assertEqual(flush_spool(), 0)
+        self.assertEqual(ContactUs.objects.count(), 2)
+        self.post(2)
+        self.run_flushes()
+        self.assertEqual(ContactUs.objects.count(), 3)
+
+    def test_burst_from_one_ip_is_throttled(self):
+        statuses = [self.post(n).status_code for n in range(6)]
+        self.assertEqual(statuses, [200, 200, 200, 200, 429, 429])
+        self.assertEqual(self.post(6, ip='10.0.0.2').status_code, 200)
+
+
+class ContactSearchTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        ContactUs.objects.bulk_create([
+            ContactUs(name='Ann Leak', email='ann@example.com', message='The kitchen pipe is leaking again.'),
+            ContactUs(name='Bob', email='bob@example.com', message='Parking question, nothing about pipes.'),
+            ContactUs(name='Cy', email='cy@example.com', message='Please fix my <b>pipe</b> and the leaking sink.'),
+            ContactUs(name='Dee', email='dee@example.com', message='Lease renewal.'),
+        ])
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin)
+
+    def test_search_vector_is_maintained_on_write(self):
+        message = ContactUs.objects.create(name='Eve', email='eve@example.com', message='Broken heater')
+        self.assertEqual([m.pk for m in ContactUs.search('heater')], [message.pk])
+        ContactUs.objects.filter(pk=message.pk).update(message='Broken window')
+        self.assertFalse(ContactUs.search('heater').exists())
+
+    def test_results_are_ranked(self):
+        names = [m.name for m in ContactUs.search('leak')]
+        self.assertEqual(names, ['Ann Leak', 'Cy'])
+        self.assertEqual([m.name for m in ContactUs.search('pipe -leak')], ['Bob'])
+
+    def test_page_highlights_matches_safely(self):
+        response = self.client.get(reverse('contact_messages'), {'q': 'pipe'})
+        self.assertContains(response, '<mark>pipe</mark>')
+        self.assertContains(response, '&lt;b&gt;')
+        self.assertNotContains(response, 'Lease renewal')
+
+    def test_admin_search(self):
+        response = self.client.get(reverse('admin:BigHouseWeb_contactus_changelist'), {'q': 'leaking'})
+        self.assertEqual([m.name for m in response.context['cl'].result_list], ['Ann Leak', 'Cy'])
+        self.assertContains(response, '<mark>leaking</mark>')
+
+
+class MarkOverdueRentTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create_user('owner', password='pw')
+        seed_portfolio(owner, 2, 3)
+
+    def test_sweep_moves_past_due_rows(self):
+        upcoming = RentPayment.objects.first()
+        upcoming.due_date = date(2025, 3, 1)
+        upcoming.save()
+
+        out = StringIO()
+        call_command('mark_overdue_rent', '--as-of', '2025-02-01', '--batch-size', '2', stdout=out)
+        self.assertIn('b0: 2 marked overdue', out.getvalue())
+        self.assertIn('b1: 3 marked overdue', out.getvalue())
+        self.assertIn('Marked 5 rent payments overdue', out.getvalue())
+
+        self.assertEqual(RentPayment.objects.filter(status='overdue').count(), 5)
+        self.assertEqual(RentPayment.objects.get(pk=upcoming.pk).status, 'due')
+        self.assertEqual(RentLedger.objects.filter(status='overdue').count(), 5)
+        self.assertEqual(RentLedger.objects.get(tenant_id=upcoming.tenant_id).status, 'due')
+
+    def test_batch_size_must_be_positive(self):
+        with self.assertRaisesMessage(CommandError, '--batch-size must be at least 1'):
+            call_command('mark_overdue_rent', '--batch-size', '0', stdout=StringIO())
+        self.assertFalse(RentPayment.objects.filter(status='overdue').exists())
+
+
+class BuildingRollupTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_owner()
+        seed_portfolio(self.owner, 1, 4)
+        self.building = Building.objects.get()
+
+    def rollup(self):
+        return BuildingRollup.objects.get(building=self.building, month=BuildingRollup.current_month())
+
+    def test_signals_keep_rollup_current(self):
+        house = House.objects.get(house_number='0')
+        house.is_occupied = False
+        with self.captureOnCommitCallbacks(execute=True):
+            house.save()
+        self.assertEqual(self.rollup().occupied_count, 3)
+        self.assertEqual(self.rollup().rent_roll, Decimal('3000.00'))
+
+        payment = RentPayment.objects.filter(tenant__house__house_number='1').get()
+        payment.status = 'paid'
+        payment.paid_date = timezone.localdate()
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.save()
+        self.assertEqual(self.rollup().collected, Decimal('1000.00'))
+
+        RentPayment.objects.filter(status='due').update(status='overdue')
+        call_command('rebuild_building_rollups', stdout=StringIO())
+        self.assertEqual(self.rollup().arrears, Decimal('3000.00'))
+
+    def test_transaction_rebuilds_each_building_once(self):
+        with mock.patch.object(BuildingRollup, 'rebuild', wraps=BuildingRollup.rebuild) as rebuild:
+            with self.captureOnCommitCallbacks(execute=True):
+                for house in House.objects.all():
+                    house.rent_amount = Decimal('1500.00')
+                    house.save()
+                self.assertFalse(rebuild.called)
+        rebuild.assert_called_once_with(BuildingRollup.current_month(), {self.building.pk})
+        self.assertEqual(self.rollup().rent_roll, Decimal('6000.00'))
+
+    def test_dashboards_show_rollups(self):
+        self.client.force_login(self.owner)
+        response = self.client.get(reverse('management_dashboard'))
+        self.assertContains(response, '100% (4/4)')
+        response = self.client.get(reverse('admin_management'))
+        self.assertContains(response, '$4000.00')
+
+    def test_rebuild_refreshes_cached_admin_rows(self):
+        self.client.force_login(self.owner)
+        self.client.get(reverse('admin_management'))
+        House.objects.update(rent_amount=Decimal('2000.00'))
+        call_command('rebuild_building_rollups', stdout=StringIO())
+        self.assertContains(self.client.get(reverse('admin_management')), '$8000.00')
+
+    def test_building_delete_cascades(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.building.delete()
+        self.assertFalse(BuildingRollup.objects.exists())
+
+
+class ConditionalApiTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_owner(login=True)
+        seed_portfolio(self.owner, 2, 3)
+        seed_portfolio(User.objects.create_user('other'), 1, 2, prefix='other')
+
+    def test_scoped_results(self):
+        for resource, count in [('buildings', 2), ('houses', 6), ('tenants', 6), ('payments', 6), ('alerts', 0)]:
+            data = self.client.get(reverse('api_list', args=[resource])).json()
+            self.assertEqual(len(data['results']), count, resource)
+
+    def test_unchanged_poll_is_not_modified(self):
+        url = reverse('api_list', args=['payments'])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        self.assertNotIn('Last-Modified', response)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('bighouseweb_rentpayment' in q['sql'] for q in ctx.captured_queries))
+
+        RentPayment.objects.filter(tenant__house__building__name='b0').first().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_deleted_building_invalidates(self):
+        url = reverse('api_list', args=['buildings'])
+        etag = self.client.get(url)['ETag']
+        Building.objects.filter(name='b1').delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 1)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_owners_changes_do_not_invalidate(self):
+        url = reverse('api_list', args=['houses'])
+        etag = self.client.get(url)['ETag']
+        House.objects.filter(building__name='other0').first().save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class AccessScopeTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_owner()
+        seed_portfolio(self.owner, 2, 1)
+        self.manager = User.objects.create_user('manager', password='pw')
+        self.manager.userprofile.user_type = 'manager'
+        self.manager.userprofile.managed_building = Building.objects.get(name='b0')
+        self.manager.userprofile.save()
+
+    def scope_for(self, user):
+        return get_access_scope(User.objects.get(pk=user.pk))
+
+    def test_scope_is_cached_across_requests(self):
+        self.assertEqual(self.scope_for(self.owner).building_ids, set(Building.objects.values_list('pk', flat=True)))
+        with CaptureQueriesContext(connection) as ctx:
+            scope = self.scope_for(self.owner)
+        self.assertTrue(scope.is_owner_or_superuser)
+        self.assertFalse(any('bighouseweb_building' in q['sql'].lower() for q in ctx.captured_queries))
+
+    def test_reassignment_invalidates_scope(self):
+        b0, b1 = Building.objects.get(name='b0'), Building.objects.get(name='b1')
+        self.assertEqual(self.scope_for(self.manager).building_ids, {b0.pk})
+
+        profile = self.manager.userprofile
+        profile.managed_building = b1
+        profile.save()
+        self.assertEqual(self.scope_for(self.manager).building_ids, {b1.pk})
+
+        new_owner = User.objects.create_user('new-owner')
+        b1.owner = new_owner
+        b1.save()
+        self.assertEqual(self.scope_for(self.owner).building_ids, {b0.pk})
+
+    def test_manager_limited_to_managed_building(self):
+        self.client.force_login(self.manager)
+        other_tenant = Tenant.objects.get(house__building__name='b1')
+        response = self.client.get(reverse('delete_tenant', args=[other_tenant.pk]))
+        self.assertEqual(response.status_code, 403)
+
+        payment = RentPayment.objects.get(tenant__house__building__name='b0')
+        self.client.get(reverse('mark_rent_paid', args=[payment.pk]))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'paid')
+
+    def test_user_without_profile_reaches_nothing(self):
+        user = User.objects.create_user('legacy', password='pw')
+        UserProfile.objects.filter(user=user).delete()
+        scope = self.scope_for(user)
+        self.assertEqual((scope.role, scope.building_ids), ('tenant', frozenset()))
+
+        self.client.force_login(user)
+        response = self.client.get(reverse('management_dashboard'))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+
+    def nav_links(self, user):
+        # Which of the role-dependent links the page header shows
+        if user:
+            self.client.force_login(user)
+        content = self.client.get(reverse('home')).content.decode()
+        return {
+            'dashboard': f'href="{reverse("management_dashboard")}"' in content,
+            'admin': f'href="{reverse("admin_management")}"' in content,
+        }
+
+    def test_nav_links_follow_the_role(self):
+        tenant = Tenant.objects.select_related('user').first().user
+        superuser = User.objects.create_superuser('admin', password='pw')
+        for user, dashboard, admin in [
+            (None, False, False), (tenant, False, False), (self.manager, True, False),
+            (self.owner, True, True), (superuser, True, True),
+        ]:
+            with self.subTest(user=user and user.username):
+                self.assertEqual(self.nav_links(user), {'dashboard': dashboard, 'admin': admin})
+
+
+class CachedUserTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_owner()
+        seed_portfolio(self.owner, 1, 1)
+        self.client.force_login(self.owner)
+
+    def auth_queries(self, url):
+        # Reads of the session, user or profile tables
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        tables = ('FROM "django_session"', 'FROM "auth_user"', 'FROM "BigHouseWeb_userprofile"')
+        return response, [q['sql'] for q in ctx.captured_queries if any(table in q['sql'] for table in tables)]
+
+    def test_warm_requests_skip_session_and_user_reads(self):
+        # Logging in already cached the session; the user and profile come in one query
+        _, cold = self.auth_queries(reverse('profile'))
+        self.assertEqual(len(cold), 1)
+        self.assertIn('JOIN "BigHouseWeb_userprofile"', cold[0])
+        for name in ('profile', 'management_dashboard'):
+            _, warm = self.auth_queries(reverse(name))
+            self.assertEqual(warm, [])
+
+    def test_user_and_profile_saves_invalidate(self):
+        self.client.get(reverse('profile'))
+        self.owner.first_name = 'Grace'
+        self.owner.save()
+        response, _ = self.auth_queries(reverse('profile'))
+        self.assertEqual(response.wsgi_request.user.first_name, 'Grace')
+
+        profile = self.owner.userprofile
+        profile.user_type = 'tenant'
+        profile.save()
+        self.assertEqual(self.client.get(reverse('management_dashboard')).status_code, 302)
+
+    def test_scope_bumps_invalidate(self):
+        self.client.get(reverse('management_dashboard'))
+        Building.objects.create(name='new', address='2 Main St', owner=self.owner)
+        response = self.client.get(reverse('admin_management'))
+        self.assertContains(response, '<td>new</td>')
+
+    def test_deactivated_user_is_logged_out(self):
+        self.client.get(reverse('profile'))
+        self.owner.is_active = False
+        self.owner.save()
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 302)
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncTenantViewTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create_user('owner')
+        seed_portfolio(owner, 1, 1)
+        self.tenant = Tenant.objects.select_related('user', 'house__building').get()
+        ManagementAlert.objects.create(building=self.tenant.house.building, title='Water off', message='Tuesday')
+        self.client.force_login(self.tenant.user)
+
+    async def test_profile_matches_sync_view(self):
+        await self.async_client.aforce_login(self.tenant.user)
+        response = await self.async_client.get('/async/profile/')
+        sync_response = await sync_to_async(self.client.get)(reverse('profile'))
+        self.assertEqual(response.status_code, 200)
+        for text in ('Water off', self.tenant.house.building.name, '$1000.00/month'):
+            self.assertContains(response, text)
+            self.assertContains(sync_response, text)
+        self.assertEqual(response.context['rent_status'], sync_response.context['rent_status'])
+
+    async def test_rent_status(self):
+        await self.async_client.aforce_login(self.tenant.user)
+        response = await self.async_client.get('/async/rent-status/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['rent_payments']), 1)
+        self.assertEqual(response.context['house'], self.tenant.house)
+
+    async def test_rent_status_is_tenant_only(self):
+        owner = await User.objects.aget(username='owner')
+        await self.async_client.aforce_login(owner)
+        response = await self.async_client.get('/async/rent-status/')
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+
+
+class AlertStreamTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create_user('owner')
+        seed_portfolio(owner, 1, 1)
+        self.tenant = Tenant.objects.select_related('user', 'house__building').get()
+        self.building = self.tenant.house.building
+        ManagementAlert.objects.create(building=self.building, title='Water off', message='Tuesday')
+
+    def write(self, func):
+        # Publishing waits for commit, which the test transaction never does
+        with self.captureOnCommitCallbacks(execute=True):
+            return func()
+
+    async def open_stream(self, user, **headers):
+        await self.async_client.aforce_login(user)
+        response, self.stream = await open_event_stream(self.async_client, reverse('alert_stream'), headers=headers)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return aiter(response.streaming_content)
+
+    async def close_stream(self, events):
+        await events.aclose()
+        await self.stream.aclose()
+        self.assertNotIn(ManagementAlert.stream_channel(self.building.pk), get_broker()._subscribers)
+
+    async def next_event(self, events):
+        return (await asyncio.wait_for(anext(events), 2)).decode()
+
+    async def test_pushes_new_and_withdrawn_alerts(self):
+        events = await self.open_stream(self.tenant.user)
+        self.assertEqual(await self.next_event(events), 'retry: 1000\n\n')
+        snapshot = await self.next_event(events)
+        self.assertIn('event: snapshot', snapshot)
+        self.assertIn('Water off', snapshot)
+
+        alert = await sync_to_async(self.write)(lambda: ManagementAlert.objects.create(
+            building=self.building, title='Lift repair', message='Friday'))
+        pushed = await self.next_event(events)
+        self.assertIn('event: alert\n', pushed)
+        self.assertIn('Lift repair', pushed)
+
+        def deactivate():
+            alert.is_active = False
+            alert.save()
+        await sync_to_async(self.write)(deactivate)
+        withdrawn = await self.next_event(events)
+        self.assertIn('event: alert_removed', withdrawn)
+        self.assertIn(f'"id": {alert.pk}', withdrawn)
+        await self.close_stream(events)
+
+    async def test_reconnect_with_current_id_skips_snapshot(self):
+        building = await Building.objects.aget(pk=self.building.pk)
+        with mock.patch('BigHouseWeb.views.ALERT_STREAM_HEARTBEAT', 0.01):
+            events = await self.open_stream(self.tenant.user, last_event_id=str(building.version))
+            await self.next_event(events)
+            self.assertEqual(await self.next_event(events), ': keep-alive\n\n')
+            await self.close_stream(events)
+
+            events = await self.open_stream(self.tenant.user, last_event_id=str(building.version - 1))
+            await self.next_event(events)
+            self.assertIn('event: snapshot', await self.next_event(events))
+            await self.close_stream(events)
+
+    async def test_other_buildings_and_non_tenants(self):
+        events = await self.open_stream(self.tenant.user)
+        await self.next_event(events)
+        await self.next_event(events)
+        owner = await User.objects.aget(username='owner')
+        other = await sync_to_async(Building.objects.create)(name='Other', address='2 Main St', owner=owner)
+        await sync_to_async(self.write)(lambda: ManagementAlert.objects.create(
+            building=other, title='Elsewhere', message='-'))
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(anext(events), 0.2)
+        await self.close_stream(events)
+
+        await self.async_client.aforce_login(owner)
+        response = await self.async_client.get(reverse('alert_stream'))
+        self.assertEqual(response.status_code, 204)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTests(BigHouseTestCase):
+    def serve(self, view, method='get', pinned=False):
+        request = getattr(RequestFactory(), method)('/')
+        if pinned:
+            request.COOKIES[PIN_COOKIE] = '1'
+        self.used = []
+        return ReplicaPinMiddleware(view)(request)
+
+    def read(self):
+        # QuerySet.db asks the router without running a query
+        self.used.append(Building.objects.all().db)
+        return HttpResponse()
+
+    def test_marked_views_read_from_replicas(self):
+        response = self.serve(read_from_replica(lambda request: self.read()))
+        self.assertIn(self.used[0], ['replica1', 'replica2'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        self.serve(lambda request: self.read())
+        self.assertEqual(self.used, ['default'])
+        self.serve(read_from_replica(lambda request: self.read()), method='post')
+        self.assertEqual(self.used, ['default'])
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        @read_from_replica
+        def view(request):
+            self.read()
+            self.used.append(router.db_for_write(Building))
+            return self.read()
+
+        response = self.serve(view)
+        self.assertEqual(self.used[1:], ['default', 'default'])
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 10)
+
+        self.serve(read_from_replica(lambda request: self.read()), pinned=True)
+        self.assertEqual(self.used, ['default'])
+
+    def test_session_saves_do_not_pin(self):
+        @read_from_replica
+        def view(request):
+            router.db_for_write(Session)
+            return self.read()
+
+        response = self.serve(view)
+        self.assertNotEqual(self.used, ['default'])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_primary_reads_block(self):
+        @read_from_replica
+        def view(request):
+            with primary_reads():
+                self.read()
+            return self.read()
+
+        self.serve(view)
+        self.assertEqual(self.used[0], 'default')
+        self.assertIn(self.used[1], ['replica1', 'replica2'])
+
+
+class ProfileRenditionTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = self.settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.profile = User.objects.create_user('tenant').userprofile
+
+    def upload(self, size=(1200, 900)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile('me.png', buffer.getvalue(), content_type='image/png')
+
+    def test_renditions_built_after_commit(self):
+        with mock.patch('BigHouseWeb.models.schedule_profile_renditions') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.profile.profile_picture = self.upload()
+                self.profile.save()
+        schedule.assert_called_once_with(self.profile.pk, self.profile.profile_picture.name)
+
+        name = self.profile.profile_picture.name
+        build_profile_renditions(self.profile.pk, name)
+        self.profile.refresh_from_db()
+        self.assertTrue(self.profile.renditions_ready)
+        self.assertTrue(self.profile.avatar_url.endswith(f'/renditions/{os.path.basename(name)}/avatar.jpg'))
+        for rendition, size in RENDITIONS.items():
+            with default_storage.open(rendition_name(name, rendition)) as f:
+                self.assertEqual(Image.open(f).size, size)
+
+    def test_replacing_picture_removes_old_renditions(self):
+        with mock.patch('BigHouseWeb.models.schedule_profile_renditions'):
+            self.profile.profile_picture = self.upload()
+            self.profile.save()
+            old = self.profile.profile_picture.name
+            build_profile_renditions(self.profile.pk, old)
+            self.profile.refresh_from_db()
+
+            self.profile.profile_picture = self.upload((300, 300))
+            self.profile.save()
+        self.assertFalse(self.profile.renditions_ready)
+        self.assertFalse(default_storage.exists(rendition_name(old, 'avatar')))
+        self.assertEqual(self.profile.avatar_url, self.profile.profile_picture.url)
+
+
+    def test_renditions_cannot_collide_with_other_pictures(self):
+        names = ['pics/x.png', 'pics/x.jpg', 'pics/x_avatar.jpg']
+        renditions = {rendition_name(name, 'avatar') for name in names}
+        self.assertEqual(len(renditions), 3)
+        self.assertFalse(renditions & set(names))
+        for name in names:
+            self.assertEqual(rendition_source(rendition_name(name, 'small')), name)
+        self.assertIsNone(rendition_source('pics/x_avatar.jpg'))
+
+    def test_worker_closes_its_connections(self):
+        with mock.patch('BigHouseWeb.images.build_profile_renditions') as build, \
+                mock.patch('BigHouseWeb.images.connections') as connections:
+            build.side_effect = OSError
+            with self.assertRaises(OSError):
+                build_renditions_in_worker(self.profile.pk, 'pics/x.png')
+        connections.close_all.assert_called_once_with()
+
+
+class MediaServingTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = self.settings(MEDIA_ROOT=self.media_root, MEDIA_PRIVATE_PREFIXES=['private/'])
+        override.enable()
+        self.addCleanup(override.disable)
+        os.makedirs(os.path.join(self.media_root, 'private'))
+        for name in ('logo.txt', 'private/secret.txt'):
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(b'0123456789')
+
+    def test_full_response_and_revalidation(self):
+        response = self.client.get('/media/logo.txt')
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('public', response['Cache-Control'])
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/media/logo.txt', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        last_modified = response['Last-Modified']
+        self.assertEqual(self.client.get('/media/logo.txt', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get('/media/logo.txt', HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+        response = self.client.get('/media/logo.txt', HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = self.client.get('/media/logo.txt', HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+        response = self.client.get('/media/logo.txt', HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_private_files_need_login(self):
+        tenant = User.objects.create_user('tenant')
+        UserProfile.objects.filter(user=tenant).update(profile_picture='private/secret.txt')
+        self.assertEqual(self.client.get('/media/private/secret.txt').status_code, 403)
+        self.client.force_login(tenant)
+        response = self.client.get('/media/private/secret.txt')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_private_files_are_authorized_per_file(self):
+        owner = self.make_owner()
+        seed_portfolio(owner, 1, 1)
+        UserProfile.objects.filter(user__username='b0-t0').update(profile_picture='private/secret.txt')
+        avatar = os.path.join(self.media_root, rendition_name('private/secret.txt', 'avatar'))
+        os.makedirs(os.path.dirname(avatar))
+        shutil.copy(os.path.join(self.media_root, 'private/secret.txt'), avatar)
+
+        self.client.force_login(User.objects.create_user('other'))
+        self.assertEqual(self.client.get('/media/private/secret.txt').status_code, 404)
+        self.assertEqual(self.client.get('/media/private/renditions/secret.txt/avatar.jpg').status_code, 404)
+        self.client.force_login(owner)
+        self.assertEqual(self.client.get('/media/private/secret.txt').status_code, 200)
+        self.assertEqual(self.client.get('/media/private/renditions/secret.txt/avatar.jpg').status_code, 200)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(self.client.get('/media/private/secret.txt').status_code, 200)
+
+    def test_traversal_and_missing_files(self):
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/missing.txt').status_code, 404)
+        self.assertEqual(self.client.get('/media/private').status_code, 404)
+
+    def test_non_canonical_paths_into_private_files(self):
+        tenant = User.objects.create_user('tenant')
+        UserProfile.objects.filter(user=tenant).update(profile_picture='private/secret.txt')
+        urls = ['/media/./private/secret.txt', '/media/private/./secret.txt', '/media/private//secret.txt',
+                '/media/x/../private/secret.txt', '/media/logo.txt/../private/secret.txt']
+        for signed_in in (None, User.objects.create_user('other')):
+            if signed_in:
+                self.client.force_login(signed_in)
+            for url in urls:
+                with self.subTest(url=url, user=signed_in):
+                    self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_sendfile_offload(self):
+        with self.settings(MEDIA_SENDFILE_BACKEND='nginx'):
+            response = self.client.get('/media/logo.txt')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/logo.txt')
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+        with self.settings(MEDIA_SENDFILE_BACKEND='xsendfile'):
+            response = self.client.get('/media/logo.txt')
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'logo.txt'))
+
+
+class ViewBenchmarkTests(BigHouseTestCase):
+    """
+    Times every view against a seeded portfolio and fails when one goes
+    over its query, row or latency budget in benchmarks.BENCHMARKS. Set
+    BIGHOUSE_BENCHMARK_REPORT=1 to print the measurements.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.portfolio = seed_benchmark_portfolio()
+
+    def setUp(self):
+        super().setUp()
+        spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spool_dir)
+        # The report already shows which views are slow
+        override = self.settings(CONTACT_SPOOL_DIR=spool_dir, METRICS_SLOW_REQUEST_MS=10 ** 9)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_every_view_has_a_benchmark(self):
+        names = {pattern.name for pattern in app_urls.urlpatterns + accounts_urls.urlpatterns}
+        self.assertEqual(names - {benchmark.url_name for benchmark in BENCHMARKS}, set())
+
+    def test_views_stay_within_budget(self):
+        results = []
+        for benchmark in BENCHMARKS:
+            with self.subTest(benchmark.label):
+                measurement = run_benchmark(self.client, self.async_client, benchmark, self.portfolio)
+                results.append((benchmark, measurement))
+                self.assertEqual(measurement.status, benchmark.status)
+                self.assertEqual(benchmark.over_budget(measurement), [])
+        if os.environ.get('BIGHOUSE_BENCHMARK_REPORT'):
+            sys.stderr.write('\n' + format_report(results) + '\n')
+
+
+class SeedBigHouseTests(BigHouseTestCase):
+    def seed(self, prefix, seed=7):
+        call_command('seed_bighouse', buildings=3, houses_per_building=5, months=4, until='2025-06',
+                     seed=seed, prefix=prefix, password='pw', batch_size=2, stdout=StringIO())
+        return list(RentPayment.objects.filter(tenant__user__username__startswith=f'{prefix}-').order_by(
+            'tenant__house__building__name', 'tenant__house__house_number', 'due_date',
+        ).values_list('tenant__house__house_number', 'amount', 'due_date', 'paid_date', 'status'))
+
+    def test_same_seed_same_portfolio(self):
+        first = self.seed('a')
+        self.assertEqual(self.seed('b'), first)
+        self.assertNotEqual(self.seed('c', seed=8), first)
+        self.assertEqual({row[2] for row in first}, {date(2025, month, 1) for month in (3, 4, 5, 6)})
+
+    def test_derived_rows_and_accounts(self):
+        self.seed('a')
+        tenants = Tenant.objects.filter(user__username__startswith='a-')
+        self.assertEqual(RentLedger.objects.filter(tenant__in=tenants).count(), tenants.count())
+        self.assertEqual(BuildingRollup.objects.filter(building__name__startswith='a ').count(), 3)
+        manager = User.objects.get(username='a-manager-0')
+        self.assertEqual(manager.userprofile.managed_building.name, 'a building 0')
+        self.assertTrue(manager.check_password('pw'))
+        with self.assertRaises(CommandError):
+            self.seed('a')
+
+
+class RequestMetricsTests(BigHouseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.owner = self.make_owner()
+        seed_portfolio(self.owner, 1, 3)
+        self.client.force_login(self.owner)
+
+    def test_requests_are_recorded_by_url_name(self):
+        labels = ('management_dashboard', 'GET', '200')
+        before = REQUEST_SECONDS.count(labels)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('management_dashboard'))
+        self.assertEqual(REQUEST_SECONDS.count(labels), before + 1)
+
+        with self.settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+            body = self.client.get('/metrics').content.decode()
+        self.assertIn('# TYPE bighouse_request_duration_seconds histogram', body)
+        self.assertIn(f'bighouse_request_duration_seconds_count{{view="management_dashboard",method="GET",'
+                      f'status="200"}} {before + 1}', body)
+        queries = [line for line in body.splitlines()
+                   if line.startswith('bighouse_request_queries_bucket{view="management_dashboard",le="+Inf"}')]
+        self.assertEqual(len(queries), 1)
+        self.assertIn(f'le="{QUERY_COUNT.buckets[bisect.bisect_left(QUERY_COUNT.buckets, len(ctx))]}"', body)
+        self.assertRegex(body, r'bighouse_request_template_duration_seconds_sum\{view="management_dashboard"\} 0\.0*[1-9]')
+
+    def test_slow_requests_log_their_queries(self):
+        with self.settings(METRICS_SLOW_REQUEST_MS=0), self.assertLogs('BigHouseWeb.metrics', 'WARNING') as logs:
+            self.client.get(reverse('rent_status'))
+        self.assertIn('Slow request GET /rent-status/ (rent_status)', logs.output[0])
+        self.assertIn('ms: SELECT', logs.output[0])
+
+    def test_metrics_access(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 404)
+        # A proxy on the same host makes everyone look local, so loopback isn't trusted by default
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='127.0.0.1').status_code, 404)
+        with self.settings(METRICS_ALLOWED_IPS=['10.1.2.3']):
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 200)
+        with self.settings(METRICS_TOKEN='s3cret'):
+            response = self.client.get('/metrics', REMOTE_ADDR='10.1.2.3', headers={'Authorization': 'Bearer s3cret'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3',
+                                             headers={'Authorization': 'Bearer nope'}).status_code, 404)
@@ -1,16 +1,26 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if settings.ASYNC_TENANT_VIEWS:
+    profile_view, rent_status_view = views.async_profile_view, views.async_rent_status_view
+else:
+    profile_view, rent_status_view = views.profile_view, views.rent_status_view
+
 urlpatterns = [
     path('', views.home, name='home'),
-    path('profile/', views.profile_view, name='profile'),
+    path('profile/', profile_view, name='profile'),
     path('management/', views.management_dashboard, name='management_dashboard'),
+    path('management/rows/<str:table>/', views.dashboard_rows, name='dashboard_rows'),
     path('admin-management/', views.admin_management, name='admin_management'),
     path('tenant/delete/<int:tenant_id>/', views.delete_tenant, name='delete_tenant'),
     path('building/delete/<int:building_id>/', views.delete_building, name='delete_building'),
     path('rent/mark_paid/<int:payment_id>/', views.mark_rent_paid, name='mark_rent_paid'),
-    path('rent-status/', views.rent_status_view, name='rent_status'),
+    path('rent-status/', rent_status_view, name='rent_status'),
+    path('alerts/stream/', views.alert_stream, name='alert_stream'),
     path('process-payment/', views.process_payment, name='process_payment'),
     path('admin/contact-messages/', views.contact_messages_view, name='contact_messages'),
     path('contact/', views.contact_us_view, name='contact_us'),
+    path('api/<str:resource>/', views.api_list, name='api_list'),
+    path('export/<str:dataset>.<str:file_format>', views.export_data, name='export_data'),
 ]
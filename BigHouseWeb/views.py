@@ -1,4 +1,7 @@
 # views.py
+import asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.forms import AuthenticationForm
@@ -6,22 +9,65 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.http import JsonResponse, HttpResponseForbidden
+from django.utils.safestring import mark_safe
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, HttpResponseBadRequest, Http404, StreamingHttpResponse
 from .models import *
+from .access import get_access_scope
+from .fragments import building_fragments, cached_fragments, fragment_key
+from .contact_spool import allow_request, spool_message
+from .deletion import start_building_deletion
+from .pubsub import get_broker
+from .routers import read_from_replica
 from .forms import CustomUserCreationForm, UserProfileForm, BuildingForm, HouseForm, AlertForm, ContactUsForm
 from datetime import date
 from decimal import Decimal
 from django.core.paginator import Paginator
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_GET, condition
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery, Count, Sum, Max
+from django.template.loader import render_to_string
+from django.core.serializers.json import DjangoJSONEncoder
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+import csv
+import hashlib
+import json
 
 
 def is_owner_or_superuser(user):
-    return user.is_superuser or (hasattr(user, 'userprofile') and user.userprofile.user_type == 'owner')
+    return get_access_scope(user).is_owner_or_superuser
 
 def is_manager_or_above(user):
-    return user.is_superuser or (hasattr(user, 'userprofile') and 
-                                user.userprofile.user_type in ['manager', 'owner'])
+    return get_access_scope(user).is_manager_or_above
+
+def latest_payment_annotations():
+    # Expose each tenant's most recent payment (what `tenant.rent_payments.last`
+    # returns) as columns, so templates don't run a query per tenant row
+    latest = RentPayment.objects.filter(tenant=OuterRef('pk')).order_by('-pk')
+    return {
+        'latest_payment_id': Subquery(latest.values('pk')[:1]),
+        'latest_payment_status': Subquery(latest.values('status')[:1]),
+    }
+
+def ledger_rent_status(ledger):
+    # 'due' rows past their date are moved to 'overdue' by the
+    # mark_overdue_rent sweep, so the stored status can be trusted
+    if ledger.status in ('no_payments', 'paid', 'overdue'):
+        return ledger.status
+    if (ledger.latest_due_date - date.today()).days <= 7:
+        return 'due_soon'
+    return 'paid'  # Assume paid if not due yet
+
+def ledger_partial_payment(ledger):
+    if ledger.credit and ledger.paid_through:
+        return {
+            'amount': ledger.credit,
+            'month': ledger.paid_through.strftime('%B')
+        }
+    return None
+
+async def alist(queryset):
+    return [obj async for obj in queryset]
 
 # Create your views here.
 def home(request):
@@ -39,23 +85,12 @@ def profile_view(request):
     
     if user_profile.user_type == 'tenant':
         try:
-            tenant = Tenant.objects.get(user=request.user)
+            tenant = Tenant.objects.select_related('house__building', 'ledger').get(user=request.user)
             house = tenant.house
             rent_payments = RentPayment.objects.filter(tenant=tenant).order_by('-due_date')[:5]
             
-            # Determine rent status
-            latest_payment = rent_payments.first()
-            if latest_payment:
-                if latest_payment.status == 'paid':
-                    rent_status = 'paid'
-                elif latest_payment.due_date < date.today():
-                    rent_status = 'overdue'
-                elif (latest_payment.due_date - date.today()).days <= 7:
-                    rent_status = 'due_soon'
-                else:
-                    rent_status = 'paid'  # Assume paid if not due yet
-            else:
-                rent_status = 'no_payments'
+            # Determine rent status from the ledger instead of the history
+            rent_status = ledger_rent_status(RentLedger.for_tenant(tenant))
                 
         except Tenant.DoesNotExist:
             pass
@@ -87,32 +122,20 @@ def profile_view(request):
 
 @login_required
 def rent_status_view(request):
-    if request.user.userprofile.user_type != 'tenant':
+    if get_access_scope(request.user).role != 'tenant':
         messages.error(request, 'This page is only available for tenants.')
         return redirect('profile')
     
     try:
-        tenant = Tenant.objects.get(user=request.user)
+        tenant = Tenant.objects.select_related('house', 'ledger').get(user=request.user)
         house = tenant.house
         rent_payments = RentPayment.objects.filter(tenant=tenant).order_by('-paid_date', '-due_date')
         
-        # Calculate next due date and any partial payment info
-        next_due_date = None
-        partial_payment_info = None
-        
-        if rent_payments.exists():
-            latest_payment = rent_payments.filter(status='paid').first()
-            if latest_payment:
-                next_due_date, remainder = latest_payment.calculate_next_due_date()
-                if remainder:
-                    partial_payment_info = {
-                        'amount': remainder,
-                        'month': next_due_date.strftime('%B') if next_due_date else None
-                    }
-        
-        # If no next due date calculated, use the latest due date
-        if not next_due_date and rent_payments.exists():
-            next_due_date = rent_payments.first().due_date
+        # Next due date and any partial payment info come straight from the
+        # ledger, falling back to the latest due date when nothing is paid
+        ledger = RentLedger.for_tenant(tenant)
+        next_due_date = ledger.next_due_date
+        partial_payment_info = ledger_partial_payment(ledger)
         
     except Tenant.DoesNotExist:
         messages.error(request, 'Tenant profile not found.')
@@ -128,9 +151,142 @@ def rent_status_view(request):
     return render(request, 'BigHouseWeb/rent_status.html', context)
 
 
+# Async ORM versions of the tenant pages, routed in place of the views above
+# when ASYNC_TENANT_VIEWS is on (asgi.py sets it). Once the tenant row is
+# loaded, the remaining queries don't depend on each other and are awaited
+# together. Templates still render in a worker thread, since the base
+# layout reaches the ORM lazily through the access scope.
+
+@login_required
+async def async_profile_view(request):
+    if request.method == 'POST':
+        # Uploads and the picture signals stay on the sync path
+        return await sync_to_async(profile_view.__wrapped__)(request)
+    
+    # Reuse the loaded user when the template's context processors ask for it
+    user = request.user = await request.auser()
+    user.userprofile = user_profile = await UserProfile.objects.aget(user=user)
+    tenant = None
+    house = None
+    rent_payments = []
+    alerts = []
+    rent_status = "unknown"
+    
+    if user_profile.user_type == 'tenant':
+        tenant = await Tenant.objects.select_related('house__building', 'ledger').filter(user=user).afirst()
+        if tenant:
+            house = tenant.house
+            queries = [
+                alist(RentPayment.objects.filter(tenant=tenant).order_by('-due_date')[:5]),
+                sync_to_async(RentLedger.for_tenant)(tenant),
+            ]
+            if house:
+                queries.append(alist(ManagementAlert.objects.filter(building=house.building, is_active=True)))
+            rent_payments, ledger, *found_alerts = await asyncio.gather(*queries)
+            rent_status = ledger_rent_status(ledger)
+            alerts = found_alerts[0] if found_alerts else []
+    
+    context = {
+        'user_profile': user_profile,
+        'tenant': tenant,
+        'house': house,
+        'rent_payments': rent_payments,
+        'rent_status': rent_status,
+        'alerts': alerts,
+        'form': UserProfileForm(instance=user_profile),
+        # Served over ASGI, so the alert list can follow the live stream
+        'live_alerts': True,
+    }
+    return await sync_to_async(render)(request, 'BigHouseWeb/profile.html', context)
+
+@login_required
+async def async_rent_status_view(request):
+    user = request.user = await request.auser()
+    if (await sync_to_async(get_access_scope)(user)).role != 'tenant':
+        messages.error(request, 'This page is only available for tenants.')
+        return redirect('profile')
+    
+    tenant = await Tenant.objects.select_related('house', 'ledger').filter(user=user).afirst()
+    if tenant is None:
+        messages.error(request, 'Tenant profile not found.')
+        return redirect('profile')
+    
+    rent_payments, ledger = await asyncio.gather(
+        alist(RentPayment.objects.filter(tenant=tenant).order_by('-paid_date', '-due_date')),
+        sync_to_async(RentLedger.for_tenant)(tenant),
+    )
+    context = {
+        'tenant': tenant,
+        'house': tenant.house,
+        'rent_payments': rent_payments,
+        'next_due_date': ledger.next_due_date,
+        'partial_payment_info': ledger_partial_payment(ledger),
+    }
+    return await sync_to_async(render)(request, 'BigHouseWeb/rent_status.html', context)
+
+# Seconds between keep-alive comments on an idle alert stream, and the
+# reconnect delay (ms) suggested to the browser
+ALERT_STREAM_HEARTBEAT = 15
+ALERT_STREAM_RETRY = 1000
+
+def release_connection():
+    # Open streams shouldn't each pin a database connection while they wait.
+    # Inside a transaction (ATOMIC_REQUESTS, tests) the connection is kept.
+    if not connection.in_atomic_block:
+        connection.close()
+
+def sse_event(event, event_id, data):
+    return f'event: {event}\nid: {event_id}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
+
+async def alert_events(building_id, last_event_id):
+    async with get_broker().subscribe(ManagementAlert.stream_channel(building_id)) as queue:
+        # Subscribed before reading the version, so no later change is missed
+        version = await Building.objects.filter(pk=building_id).values_list('version', flat=True).afirst()
+        yield f'retry: {ALERT_STREAM_RETRY}\n\n'
+        if last_event_id != str(version):
+            # New subscriber or missed events: send the current list to start from
+            alerts = await alist(ManagementAlert.objects.filter(building_id=building_id, is_active=True)
+                                 .order_by('created_at'))
+            yield sse_event('snapshot', version, [alert.stream_data() for alert in alerts])
+        await sync_to_async(release_connection)()
+        
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), ALERT_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if message is None:
+                # The broker may have dropped events; end so the browser reconnects and resyncs
+                return
+            yield sse_event(message['event'], message['id'], message['data'])
+
+@login_required
+async def alert_stream(request):
+    """
+    Server-Sent Events feed of new and withdrawn alerts for the signed-in
+    tenant's building, meant to be served over ASGI. Event ids are the
+    building's version: a reconnect whose Last-Event-ID is no longer
+    current gets a fresh snapshot of the active alerts first.
+    """
+    user = await request.auser()
+    building_id = await (Tenant.objects.filter(user=user, house__isnull=False)
+                         .values_list('house__building_id', flat=True).afirst())
+    if building_id is None:
+        # 204 tells EventSource to stop reconnecting
+        return HttpResponse(status=204)
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    return StreamingHttpResponse(
+        alert_events(building_id, last_event_id),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
 @login_required
 def process_payment(request):
-    if request.method != 'POST' or request.user.userprofile.user_type != 'tenant':
+    if request.method != 'POST' or get_access_scope(request.user).role != 'tenant':
         messages.error(request, 'Invalid request.')
         return redirect('profile')
     
@@ -146,13 +302,15 @@ def process_payment(request):
         # Create a new rent payment record
         due_date = date.today() + relativedelta(months=+1)  # Default due date one month from now
         
-        payment = RentPayment.objects.create(
-            tenant=tenant,
-            amount=amount,
-            due_date=due_date,
-            paid_date=date.today(),
-            status='paid'
-        )
+        # The ledger is refreshed by the post_save signal in this same transaction
+        with transaction.atomic():
+            payment = RentPayment.objects.create(
+                tenant=tenant,
+                amount=amount,
+                due_date=due_date,
+                paid_date=date.today(),
+                status='paid'
+            )
         
         messages.success(request, f'Payment of ${amount} processed successfully!')
         return redirect('rent_status')
@@ -165,23 +323,125 @@ def process_payment(request):
         return redirect('rent_status')
     
     
+def attach_rollups(buildings):
+    # Give each building its current month's rollup from one indexed read
+    rollups = BuildingRollup.for_buildings([building.pk for building in buildings])
+    for building in buildings:
+        building.rollup = rollups[building.pk]
+    return buildings
+
+DASHBOARD_PAGE_SIZE = 50
+
+def dashboard_querysets(user):
+    # Get buildings based on user role
+    scope = get_access_scope(user)
+    buildings = scope.buildings()
+    houses = scope.filter(House.objects.all())
+    
+    # Join the relations the tables render so the query count stays fixed
+    # no matter how many units the user can reach
+    houses = houses.select_related('building')
+    tenants = (
+        scope.filter(Tenant.objects.filter(house__isnull=False), 'house__building')
+        .select_related('user__userprofile', 'house__building')
+        .annotate(**latest_payment_annotations())
+    )
+    return buildings, houses, tenants
+
+def filter_dashboard_querysets(params, houses, tenants):
+    building = params.get('building', '')
+    if building.isdigit():
+        houses = houses.filter(building_id=building)
+        tenants = tenants.filter(house__building_id=building)
+    
+    occupancy = params.get('occupancy')
+    if occupancy == 'occupied':
+        houses = houses.filter(is_occupied=True)
+    elif occupancy == 'available':
+        houses = houses.filter(is_occupied=False)
+    
+    rent_status = params.get('rent_status')
+    if rent_status == 'none':
+        tenants = tenants.filter(latest_payment_id__isnull=True)
+    elif rent_status in dict(RentPayment.STATUS_CHOICES):
+        tenants = tenants.filter(latest_payment_status=rent_status)
+    return houses, tenants
+
+def encode_cursor(building_id, house_number):
+    position = json.dumps([building_id, house_number])
+    return urlsafe_b64encode(position.encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        building_id, house_number = json.loads(urlsafe_b64decode(cursor.encode()))
+        return int(building_id), str(house_number)
+    except (ValueError, TypeError):
+        return None
+
+DASHBOARD_TABLES = {
+    # table: (row template, its context name, lookup prefix leading to the House)
+    'houses': ('BigHouseWeb/partials/house_rows.html', 'houses', ''),
+    'tenants': ('BigHouseWeb/partials/tenant_rows.html', 'tenants', 'house__'),
+}
+
+def keyset_page(queryset, cursor, house_path=''):
+    """
+    Return the (pk, building id, house number, building version) of one
+    page of `queryset` ordered by (building, house number) plus the cursor
+    for the next page. `house_path` is the lookup prefix leading to the
+    House ('house__' for tenants). Seeking past the last row keeps every
+    page an index range scan instead of an ever-growing OFFSET.
+    """
+    building_field = f'{house_path}building_id'
+    number_field = f'{house_path}house_number'
+    queryset = queryset.order_by(building_field, number_field)
+    
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        # (building, house number) > cursor, compared in the database's collation
+        building_id, house_number = position
+        queryset = queryset.filter(**{f'{building_field}__gte': building_id}).exclude(
+            **{building_field: building_id, f'{number_field}__lte': house_number}
+        )
+    
+    rows = list(queryset.values_list(
+        'pk', building_field, number_field, f'{house_path}building__version'
+    )[:DASHBOARD_PAGE_SIZE + 1])
+    next_cursor = None
+    if len(rows) > DASHBOARD_PAGE_SIZE:
+        rows = rows[:DASHBOARD_PAGE_SIZE]
+        _, building_id, house_number, _ = rows[-1]
+        next_cursor = encode_cursor(building_id, house_number)
+    return rows, next_cursor
+
+def render_dashboard_rows(table, queryset, pks):
+    # Each row rendered on its own, from one query for all of them
+    template, name, _ = DASHBOARD_TABLES[table]
+    return {
+        row.pk: render_to_string(template, {name: [row]})
+        for row in queryset.filter(pk__in=pks)
+    }
+
+def dashboard_page(table, queryset, cursor):
+    """
+    Return one page of rendered table rows plus the cursor for the next
+    page. The page's rows are chosen by a keyset query; each row's HTML is
+    cached under its building's change version, so an unchanged page is
+    only that query, and a write re-renders just its building's rows.
+    """
+    _, _, house_path = DASHBOARD_TABLES[table]
+    rows, next_cursor = keyset_page(queryset, cursor, house_path)
+    keys = {
+        pk: fragment_key(f'dashboard-{table}', pk, building_id, version)
+        for pk, building_id, _, version in rows
+    }
+    fragments = cached_fragments(keys, lambda pks: render_dashboard_rows(table, queryset, pks))
+    return [mark_safe(fragments[pk]) for pk, _, _, _ in rows], next_cursor
+
 @login_required
 @user_passes_test(is_manager_or_above)
+@read_from_replica
 def management_dashboard(request):
-    # Get buildings based on user role
-    if request.user.is_superuser:
-        buildings = Building.objects.all()
-        houses = House.objects.all()
-    elif request.user.userprofile.user_type == 'owner':
-        buildings = Building.objects.filter(owner=request.user)
-        houses = House.objects.filter(building__in=buildings)
-    else:  # manager
-        buildings = Building.objects.filter(managers=request.user.userprofile)
-        houses = House.objects.filter(building__in=buildings)
-    
-    tenants = Tenant.objects.filter(house__in=houses)
-    alerts = ManagementAlert.objects.filter(building__in=buildings, is_active=True)
-    
     # Forms
     house_form = HouseForm(user=request.user)
     alert_form = AlertForm(user=request.user)
@@ -201,38 +461,82 @@ def management_dashboard(request):
                 messages.success(request, 'Alert created successfully!')
                 return redirect('management_dashboard')
     
+    # Only built when the page is rendered, not for a successful POST's redirect
+    buildings, houses, tenants = dashboard_querysets(request.user)
+    houses, tenants = filter_dashboard_querysets(request.GET, houses, tenants)
+    alerts = get_access_scope(request.user).filter(ManagementAlert.objects.filter(is_active=True))
+    attach_rollups(buildings)
+    house_rows, houses_next_cursor = dashboard_page('houses', houses, None)
+    tenant_rows, tenants_next_cursor = dashboard_page('tenants', tenants, None)
+    
     context = {
         'buildings': buildings,
-        'houses': houses,
-        'tenants': tenants,
+        'house_rows': house_rows,
+        'houses_next_cursor': houses_next_cursor,
+        'tenant_rows': tenant_rows,
+        'tenants_next_cursor': tenants_next_cursor,
         'alerts': alerts,
         'house_form': house_form,
         'alert_form': alert_form,
+        'filters': request.GET,
+        'filter_query': request.GET.urlencode(),
+        'status_choices': RentPayment.STATUS_CHOICES,
     }
     return render(request, 'BigHouseWeb/management_dashboard.html', context)
 
+@login_required
+@user_passes_test(is_manager_or_above)
+@read_from_replica
+def dashboard_rows(request, table):
+    # Next page of a dashboard table, fetched by the page as the user scrolls
+    if table not in DASHBOARD_TABLES:
+        raise Http404
+    
+    _, houses, tenants = dashboard_querysets(request.user)
+    houses, tenants = filter_dashboard_querysets(request.GET, houses, tenants)
+    rows, next_cursor = dashboard_page(table, houses if table == 'houses' else tenants, request.GET.get('cursor'))
+    return JsonResponse({'html': ''.join(rows), 'next_cursor': next_cursor})
+
+def render_building_rows(building_ids, show_actions):
+    rows = dict.fromkeys(building_ids, '')
+    buildings = attach_rollups(
+        Building.objects.filter(pk__in=building_ids).select_related('owner').annotate(manager_count=Count('managers'))
+    )
+    for building in buildings:
+        rows[building.pk] = render_to_string('BigHouseWeb/partials/building_row.html',
+                                             {'building': building, 'show_actions': show_actions})
+    return rows
+
 @login_required
 @user_passes_test(is_owner_or_superuser)
+@read_from_replica
 def admin_management(request):
-    if not (request.user.is_superuser or request.user.userprofile.user_type == 'owner'):
+    scope = get_access_scope(request.user)
+    if not scope.is_owner_or_superuser:
         return HttpResponseForbidden("You don't have permission to access this page.")
     
     # Get all users for management
-    users = User.objects.all().select_related('userprofile')
+    users = User.objects.all().select_related('userprofile__managed_building')
     
-    # Get buildings based on user role
-    if request.user.is_superuser:
-        buildings = Building.objects.all()
-        can_add_owner = True
-    else:  # owner
-        buildings = Building.objects.filter(owner=request.user)
-        can_add_owner = False
+    # Get buildings based on user role; their table rows are cached per
+    # building version, so only the names and versions are read here
+    can_add_owner = scope.is_superuser
+    buildings = scope.buildings().only('name', 'version').order_by('pk')
+    building_rows = [
+        mark_safe(row) for _, row in building_fragments(
+            'admin-buildings',
+            # Rollups are per month, and only superusers see the actions column
+            f'{BuildingRollup.current_month():%Y-%m}:{"actions" if scope.is_superuser else ""}',
+            [(building.pk, building.version) for building in buildings],
+            lambda building_ids: render_building_rows(building_ids, scope.is_superuser),
+        )
+    ]
     
     building_form = BuildingForm()
     user_form = UserProfileForm()
     
     if request.method == 'POST':
-        if 'add_building' in request.POST and request.user.is_superuser:
+        if 'add_building' in request.POST and scope.is_superuser:
             building_form = BuildingForm(request.POST)
             if building_form.is_valid():
                 building = building_form.save(commit=False)
@@ -254,6 +558,7 @@ def admin_management(request):
     context = {
         'users': users,
         'buildings': buildings,
+        'building_rows': building_rows,
         'building_form': building_form,
         'user_form': user_form,
         'can_add_owner': can_add_owner,
@@ -266,21 +571,18 @@ def delete_building(request, building_id):
     building = get_object_or_404(Building, id=building_id)
     
     # Check permissions
-    if not request.user.is_superuser and building.owner != request.user:
+    if not get_access_scope(request.user).can_access_building(building.pk):
         return HttpResponseForbidden("You don't have permission to delete this building.")
     
-    # Convert managers back to tenants
-    managers = UserProfile.objects.filter(managed_building=building, user_type='manager')
-    for manager in managers:
-        manager.user_type = 'tenant'
-        manager.managed_building = None
-        manager.save()
+    if building.deleting:
+        messages.info(request, f'Building {building.name} is already being deleted.')
+        return redirect('admin_management')
     
-    # Delete the building (this will cascade to houses, alerts, etc.)
-    building_name = building.name
-    building.delete()
+    # Convert managers back to tenants, then delete the houses, alerts and
+    # building in the background; the admin page shows the progress
+    start_building_deletion(building)
     
-    messages.success(request, f'Building {building_name} and all associated data deleted successfully.')
+    messages.success(request, f'Building {building.name} and all associated data are being deleted.')
     return redirect('admin_management')
 
 @login_required
@@ -290,18 +592,13 @@ def delete_tenant(request, tenant_id):
     house = tenant.house
     
     # Check if the user has permission for this tenant's building
-    if request.user.is_superuser:
-        pass  # Superuser can do anything
-    elif request.user.userprofile.user_type == 'owner':
-        if house.building.owner != request.user:
-            return HttpResponseForbidden("You don't have permission to perform this action.")
-    else:  # manager
-        if house.building not in Building.objects.filter(managers=request.user.userprofile):
-            return HttpResponseForbidden("You don't have permission to perform this action.")
+    if not get_access_scope(request.user).can_access_building(house.building_id if house else None):
+        return HttpResponseForbidden("You don't have permission to perform this action.")
     
     # Free up the house
-    house.is_occupied = False
-    house.save()
+    if house:
+        house.is_occupied = False
+        house.save()
     
     # Delete the tenant
     tenant.delete()
@@ -311,26 +608,197 @@ def delete_tenant(request, tenant_id):
 @login_required
 @user_passes_test(is_manager_or_above)
 def mark_rent_paid(request, payment_id):
-    payment = get_object_or_404(RentPayment, id=payment_id)
+    payment = get_object_or_404(RentPayment.objects.select_related('tenant__house'), id=payment_id)
     
     # Check if the manager has permission for this payment
-    if payment.tenant.house.building.manager != request.user:
+    house = payment.tenant.house
+    if not get_access_scope(request.user).can_access_building(house.building_id if house else None):
         messages.error(request, 'You do not have permission to perform this action.')
         return redirect('management_dashboard')
     
     payment.status = 'paid'
     payment.paid_date = timezone.now().date()
-    payment.save()
+    with transaction.atomic():
+        payment.save()
     messages.success(request, 'Rent marked as paid.')
     return redirect('management_dashboard')
 
 
+API_PAGE_SIZE = 200
+
+def api_resources(user):
+    """Querysets and fields for each API resource, scoped like the management dashboard."""
+    buildings, houses, tenants = dashboard_querysets(user)
+    return {
+        'buildings': (buildings, ['id', 'name', 'address', 'owner_id', 'version', 'changed_at']),
+        'houses': (houses, ['id', 'building_id', 'house_number', 'rent_amount', 'is_occupied']),
+        'tenants': (tenants, ['id', 'user_id', 'user__username', 'house_id', 'house__building_id',
+                              'move_in_date', 'latest_payment_id', 'latest_payment_status']),
+        'alerts': (get_access_scope(user).filter(ManagementAlert.objects.all()),
+                   ['id', 'building_id', 'title', 'message', 'created_at', 'is_active']),
+        'payments': (get_access_scope(user).filter(RentPayment.objects.all(), 'tenant__house__building'),
+                     ['id', 'tenant_id', 'amount', 'due_date', 'paid_date', 'status', 'period']),
+    }
+
+def api_versions(request, resource):
+    # One aggregate over the buildings in scope
+    if not hasattr(request, '_api_versions'):
+        buildings, _, _ = dashboard_querysets(request.user)
+        request._api_versions = buildings.aggregate(
+            count=Count('pk'), version=Sum('version'), last_id=Max('pk')
+        )
+    return request._api_versions
+
+def api_etag(request, resource):
+    versions = api_versions(request, resource)
+    key = '|'.join(str(part) for part in (
+        resource, request.user.pk, versions['count'], versions['version'], versions['last_id'],
+        request.GET.urlencode(),
+    ))
+    return hashlib.md5(key.encode()).hexdigest()
+
+@login_required
+@user_passes_test(is_manager_or_above)
+@read_from_replica
+@require_GET
+@condition(etag_func=api_etag)
+def api_list(request, resource):
+    """
+    Read-only JSON for dashboard data. Responses carry an ETag derived
+    from the change versions of the caller's buildings, so a poll with
+    nothing new is answered with a 304. There is no Last-Modified: the
+    latest change time of the buildings left can't tell that one of them
+    was deleted.
+    Pages are keyset-ordered by id; pass the returned `next` as `after`.
+    """
+    resources = api_resources(request.user)
+    if resource not in resources:
+        raise Http404
+    
+    queryset, fields = resources[resource]
+    after = request.GET.get('after', '')
+    if after.isdigit():
+        queryset = queryset.filter(pk__gt=after)
+    rows = list(queryset.order_by('pk').values(*fields)[:API_PAGE_SIZE + 1])
+    
+    next_after = None
+    if len(rows) > API_PAGE_SIZE:
+        rows = rows[:API_PAGE_SIZE]
+        next_after = rows[-1]['id']
+    return JsonResponse({'results': rows, 'next': next_after})
+
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+class Echo:
+    """A file-like object whose write() hands the line back to csv.writer's caller."""
+    def write(self, value):
+        return value
+
+def parse_date_param(params, name):
+    value = params.get(name, '')
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} must look like YYYY-MM-DD')
+
+def export_querysets(user, params):
+    """Row querysets and column names for each export, scoped and filtered like the dashboard."""
+    scope = get_access_scope(user)
+    start, end = parse_date_param(params, 'from'), parse_date_param(params, 'to')
+    status = params.get('status', '')
+    
+    payments = scope.filter(RentPayment.objects.all(), 'tenant__house__building')
+    if start:
+        payments = payments.filter(due_date__gte=start)
+    if end:
+        payments = payments.filter(due_date__lte=end)
+    if status:
+        payments = payments.filter(status=status)
+    
+    rent_roll = scope.filter(House.objects.all())
+    if status:
+        rent_roll = rent_roll.filter(tenant__ledger__status=status)
+    
+    return {
+        'payments': (payments.order_by('pk'), [
+            'id', 'tenant__house__building__name', 'tenant__house__house_number', 'tenant__user__username',
+            'amount', 'due_date', 'paid_date', 'status', 'period',
+        ]),
+        'rent-roll': (rent_roll.order_by('building_id', 'house_number'), [
+            'building__name', 'house_number', 'rent_amount', 'is_occupied', 'tenant__user__username',
+            'tenant__ledger__status', 'tenant__ledger__outstanding', 'tenant__ledger__credit',
+            'tenant__ledger__paid_through',
+        ]),
+    }
+
+def stream_csv(rows, fields):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+def stream_jsonl(rows, fields):
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n'
+
+@login_required
+@user_passes_test(is_manager_or_above)
+@read_from_replica
+@require_GET
+def export_data(request, dataset, file_format):
+    """
+    Download payment history or the current rent roll as CSV or JSONL.
+    Rows are read with a chunked iterator and written out as they arrive,
+    so a multi-year export never sits in memory and the worker keeps
+    sending bytes instead of timing out while it builds a file.
+    Accepts `from` and `to` (due date, payments only) and `status`.
+    """
+    if file_format not in ('csv', 'jsonl'):
+        raise Http404
+    try:
+        exports = export_querysets(request.user, request.GET)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    if dataset not in exports:
+        raise Http404
+    
+    queryset, fields = exports[dataset]
+    rows = queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if file_format == 'csv':
+        response = StreamingHttpResponse(stream_csv(rows, fields), content_type='text/csv')
+    else:
+        response = StreamingHttpResponse(stream_jsonl(rows, fields), content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="{dataset}-{date.today():%Y-%m-%d}.{file_format}"'
+    return response
+
 @csrf_exempt
 @require_POST
 def contact_us_view(request):
+    """
+    Public contact form endpoint. Senders are rate limited per IP with a
+    cache-backed token bucket, and accepted messages are spooled to local
+    disk and written to the database in batches, so a burst of spam costs
+    no database writes on the request path.
+    """
+    allowed, retry_after = allow_request(
+        f"ratelimit:contact:{request.META.get('REMOTE_ADDR', '')}",
+        settings.CONTACT_RATE_LIMIT, settings.CONTACT_RATE_PERIOD,
+    )
+    if not allowed:
+        response = JsonResponse({
+            'success': False,
+            'errors': {'__all__': [{'message': 'Too many messages. Please try again later.', 'code': 'throttled'}]}
+        }, status=429)
+        response['Retry-After'] = str(int(retry_after) + 1)
+        return response
+    
     form = ContactUsForm(request.POST)
     if form.is_valid():
-        contact = form.save()
+        spool_message(form.cleaned_data)
         return JsonResponse({
             'success': True,
             'message': 'Thank you for your message! We will get back to you soon.'
@@ -347,10 +815,15 @@ def contact_messages_view(request):
         from django.http import HttpResponseForbidden
         return HttpResponseForbidden("You don't have permission to view this page.")
     
-    messages_list = ContactUs.objects.all().order_by('-submitted_at')
+    # Searches go through the indexed search vector, ranked with highlighted excerpts
+    query = request.GET.get('q', '').strip()
+    if query:
+        messages_list = ContactUs.search(query)
+    else:
+        messages_list = ContactUs.objects.all().order_by('-submitted_at')
     paginator = Paginator(messages_list, 10)  # Show 10 messages per page
     
     page_number = request.GET.get('page')
     messages = paginator.get_page(page_number)
 
-    return render(request, 'BigHouseWeb/contact_messages.html', {'messages': messages})
+    return render(request, 'BigHouseWeb/contact_messages.html', {'messages': messages, 'query': query})
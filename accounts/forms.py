@@ -3,6 +3,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from BigHouseWeb.models import *
+from BigHouseWeb.access import get_access_scope
 from .models import *
 
 class CustomUserCreationForm(UserCreationForm):
@@ -52,12 +53,10 @@ class HouseForm(forms.ModelForm):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         if user:
-            # Show only buildings owned by the current user
-            if user.userprofile.user_type == 'owner':
-                self.fields['building'].queryset = Building.objects.filter(owner=user)
-            # Show all buildings for superusers
-            elif user.is_superuser:
-                self.fields['building'].queryset = Building.objects.all()
+            # Show only buildings owned by the current user (all for superusers)
+            scope = get_access_scope(user)
+            if scope.is_owner_or_superuser:
+                self.fields['building'].queryset = scope.buildings()
             else:
                 self.fields['building'].queryset = Building.objects.none()
 
@@ -71,11 +70,4 @@ class AlertForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         if user:
             # Show only buildings the user has access to
-            if user.userprofile.user_type == 'owner':
-                self.fields['building'].queryset = Building.objects.filter(owner=user)
-            elif user.userprofile.user_type == 'manager':
-                self.fields['building'].queryset = Building.objects.filter(managers=user.userprofile)
-            elif user.is_superuser:
-                self.fields['building'].queryset = Building.objects.all()
-            else:
-                self.fields['building'].queryset = Building.objects.none()
+            self.fields['building'].queryset = get_access_scope(user).buildings()